@@ -19,20 +19,27 @@
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 
+import copy
 from typing import Iterable, Literal
 
 import pyperclip
 
-from textual import on
+from textual import on, work
+from textual.worker import get_current_worker
 from textual.app import ComposeResult, SystemCommand
 from textual.binding import Binding
-from textual.containers import Vertical, Horizontal, ScrollableContainer
+from textual.containers import Vertical, Horizontal
 from textual.widgets import DataTable, Footer, Tree, TabbedContent, TabPane, MarkdownViewer, TextArea
+from textual.coordinate import Coordinate
+from textual.widgets.data_table import RowKey
+from textual.widgets.tree import TreeNode
 from textual.screen import Screen
 
 from episode_names.Utility import i18n
-from episode_names.Utility.db import Project, Playlist, Episode, Folge, TextTemplate, PatternTemplate
-from episode_names.Utility.order import new_episode, create_description_text
+from episode_names.Utility.db import database_proxy, Project, Playlist, Episode, Folge, TextTemplate, PatternTemplate
+from episode_names.Utility.project_cache import project_cache, estimate_size
+from episode_names.Utility.order import (new_episode, create_description_text, iter_descriptions, get_template,
+                                         compile_templates)
 from episode_names.Modals import CreateEditProject, AssignTemplate, CreateEditEpisode, WriteNoteModal
 
 class EpisodeScreen(Screen):
@@ -49,9 +56,21 @@ class EpisodeScreen(Screen):
         Binding(key="ctrl+n", action="open_project_note", description=i18n['Project Note']),
     ]
 
+    PAGE_SIZE = 100  # rows fetched from the database at once
+    WINDOW_PAGES = 3  # pages kept in the table, the rest gets dropped again
+    PAGE_MARGIN = 10  # rows before the end of the window the next page is fetched
+    TREE_LEAF_BUDGET = 300  # project leaves kept loaded before collapsed categories release theirs
+
     def __init__(self):
         self.current_project = None
-        self.project_tree = [] # All nodes in project tree
+        self.project_nodes: dict[int, TreeNode] = {}  # project id: leaf in the project tree
+        self.category_nodes: dict[str, TreeNode] = {}  # category name: its node
+        self.episodes: dict[int, Folge] = {}  # episode id: Folge of every row loaded into the table
+        self._collapsed_categories: list[str] = []  # loaded but collapsed, least recently collapsed first
+        self._more_above = False  # * whether there are rows before or after the loaded window
+        self._more_below = False
+        self._paging = False
+        self._loading_project = None  # project a worker is currently loading for
         super().__init__()
 
     def compose(self) -> ComposeResult:#
@@ -62,8 +81,7 @@ class EpisodeScreen(Screen):
             yield self.projects
             with TabbedContent(id="tabs"):
                 with TabPane(i18n['Episodes'], id='tab_episode'):
-                    with ScrollableContainer(can_focus=False): #? stop gap measure to restore scrollability
-                        yield self.entryview
+                    yield self.entryview
                 with TabPane(i18n['Project Notes']):
                     yield MarkdownViewer(id='project_notes', show_table_of_contents=False)
                 with TabPane(i18n['All Notes']):
@@ -76,6 +94,7 @@ class EpisodeScreen(Screen):
         self.projects.show_guides = False
         self.projects.border_title = i18n['Projects']
         self.entryview.border_title = i18n['Episodes']
+        self.watch(self.entryview, "scroll_y", self._check_window, init=False)
         self.write_log("Init Data Tables and Views...")
         self._init_data()
         #self._dummy_data()
@@ -96,14 +115,14 @@ class EpisodeScreen(Screen):
     def _action_create_project_menu(self):
         def handle_callback(new_project: Playlist | None) -> None:
             if new_project:
-                Project.create_new(new_project)
-                self.redraw_project_tree()
+                new_project.db_uid = Project.create_new(new_project)
+                self._tree_upsert_project(new_project)
                 self._select_project_tree_entry(self.current_project)
         self.app.push_screen(CreateEditProject(), handle_callback)
 
     def _action_edit_project_menu(self) -> None:
         current = self.projects.cursor_node
-        if not current.data:
+        if not current or not current.data or 'db_uid' not in current.data:  # * categories carry data too
             self.app.notify(i18n['No project currently selected.'], severity="information", timeout=2)
             return
         if not current.data['db_uid']:
@@ -123,40 +142,112 @@ class EpisodeScreen(Screen):
             if isinstance(changed, bool) and changed == False: # delete request
                 if Project.is_empty(project_db_id):
                     Project.delete_by_id(project_db_id)
-                    self.redraw_project_tree()
+                    self._tree_remove_project(project_db_id, str(data.category))
                     return
             if not changed: # this should already be handled by the modal
                 return
             if changed != data:
                 Project.update_or_create(changed)
-                self.redraw_project_tree()
+                was_selected = self.projects.cursor_node is self.project_nodes.get(project_db_id)
+                self._tree_upsert_project(changed, str(data.category))
+                if was_selected:  # * a category change moves the node somewhere else
+                    self._select_project_tree_entry(project_db_id)
         self.app.push_screen(CreateEditProject(data), handle_callback) # callback here
 
     @on(Tree.NodeSelected, "#project_tree")
     def _select_project(self, message: Tree.NodeSelected):
         self.write_log("Tree Node Selected")
         self.write_log(message.node)
-        if not message.node.data:
+        if not message.node.data or 'db_uid' not in message.node.data:  # * a category
             self.write_log("No Data on leaf")
             return False
         if not message.node.data['db_uid']:
             self.write_log("db_uid tree data does not exist for this note")
             return False
-        p_uid = message.node.data['db_uid']
-        data = Project.as_Playlist_by_uid(p_uid)
-        if not data:
-            self.write_log(f"DB does not know project with ID {p_uid}")
-            return False
-        self._refill_table_with_project(p_uid)
+        self._start_loading(message.node.data['db_uid'])
+
+    def _start_loading(self, p_uid: int) -> None:
+        """Shows a cached project right away, otherwise shows the loading state and hands it over to a worker"""
+        cached = project_cache.get(p_uid)
+        if cached:
+            self.workers.cancel_group(self, "project_load")
+            self._loading_project = None
+            self.entryview.loading = False
+            self._fill_table(p_uid, *cached)
+            return
+        self._loading_project = p_uid
+        self.entryview.loading = True
+        self._load_project(p_uid)  # * replaces a load that might still run for the previous node
+
+    def _fetch_and_cache(self, p_uid: int) -> tuple:
+        """_fetch_project from the top of the project, the result also lands in the project cache"""
+        generation = project_cache.generation(p_uid)
+        loaded = self._fetch_project(p_uid, page_size=self.PAGE_SIZE)
+        project_cache.put(p_uid, loaded, estimate_size(loaded[0], loaded[3]), generation)
+        return loaded
+
+    @on(Tree.NodeHighlighted, "#project_tree")
+    def _prefetch_around_cursor(self, message: Tree.NodeHighlighted) -> None:
+        """Loads the projects next to the tree cursor into the cache so selecting them is instant"""
+        line = message.node.line
+        neighbours = []
+        for offset in (0, -1, 1):
+            node = self.projects.get_node_at_line(line + offset) if line + offset >= 0 else None
+            if node and node.data and node.data.get('db_uid'):
+                neighbours.append(node.data['db_uid'])
+        missing = [each for each in neighbours if each != self.current_project and each not in project_cache]
+        if missing:
+            self._prefetch_projects(missing)
+
+    @work(thread=True, exclusive=True, group="project_prefetch")
+    def _prefetch_projects(self, project_ids: list[int]) -> None:
+        worker = get_current_worker()
+        try:
+            for p_uid in project_ids:
+                if worker.is_cancelled:
+                    return
+                self._fetch_and_cache(p_uid)
+        finally:
+            database_proxy.close()
+
+    @work(thread=True, exclusive=True, group="project_load")
+    def _load_project(self, p_uid: int) -> None:
+        """
+        Reads everything the table and the notes need for a project on a separate thread, the
+        event loop only gets the finished data. Selecting another project in the meantime cancels
+        this worker, it then stops between two queries and never touches the widgets.
+        """
+        worker = get_current_worker()
+        try:
+            if not Project.as_Playlist_by_uid(p_uid):
+                self.app.call_from_thread(self.write_log, f"DB does not know project with ID {p_uid}")
+                loaded = None
+            elif worker.is_cancelled:
+                return
+            else:
+                loaded = self._fetch_and_cache(p_uid)
+        finally:
+            database_proxy.close()  # every thread gets its own connection
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self._show_project, p_uid, loaded)
+
+    def _show_project(self, p_uid: int, loaded: tuple | None) -> None:
+        """Puts the result of _load_project on screen, unless the user has moved on since"""
+        if p_uid != self._loading_project:
+            return
+        self._loading_project = None
+        self.entryview.loading = False
+        if loaded:
+            self._fill_table(p_uid, *loaded)
 
     def _action_new_entry(self):
         def handle_new_entry_response(this: Folge or None):
             if not this:
                 return
             self.write_raw_log(this, "New Entry Folge Object")
-            Episode.update_or_create(this)
+            new_uid = Episode.update_or_create(this)
             self.app.notify(i18n['New Entry created'])
-            self._refill_table_with_project(self.current_project)  # repaint table
+            self._update_episode_row(this.db_uid if this.db_uid > 0 else new_uid)
 
         if not self.current_project:
             self.app.notify(i18n['No currently selected project, cannot create "free" episodes'], severity="warning")
@@ -172,13 +263,12 @@ class EpisodeScreen(Screen):
         if not self.current_project:
             return
         proj = Project.as_Playlist_by_uid(self.current_project)
-        epis = Episode.by_project(self.current_project, 'asc')
+        epis = Episode.iter_by_project(self.current_project, 'asc')
         path_file = f"{proj.title}.md"
         with open(path_file, "w") as md_file:
             md_file.write(f"# {proj.title}\n\n")
             md_file.write(f"> {proj.description}\n")
-            for each in epis:
-                desc = create_description_text(each)
+            for each, desc in iter_descriptions(epis):
                 md_file.write(f"## {each.title}\n")
                 md_file.write(f"{desc}\n")
                 md_file.write(f"\n`{each.edit_date}`\n")
@@ -189,26 +279,22 @@ class EpisodeScreen(Screen):
             if not this:
                 return
             Episode.update_or_create(this)
-            self._refill_table_with_project(self.current_project)
+            self._update_episode_row(this.db_uid)
+
+        this = self._cursor_episode()
+        if this:
+            self.app.push_screen(CreateEditEpisode(this), handle_edit_entry_response)
+            return
 
-        row_key, column_key = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate)
-        if row_key:
-            this = Episode.as_Folge_by_uid(row_key.value)
-            if this:
-                self.app.push_screen(CreateEditEpisode(this), handle_edit_entry_response)
-                return
     def _action_copy_tags(self):
         """
         Copies tags of the currently selected episode to the clipboard
         :return: Nothing
         """
-        row_key, column_key = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate)
-        if not row_key:
-            return
-        this = Episode.as_Folge_by_uid(row_key.value)
+        this = self._cursor_episode()
         if not this:
             return
-        that = TextTemplate.as_PTemplate_by_uid(this.db_template)
+        that = get_template(this.db_template)
         if not that:
             self.app.notify(i18n['Current episode has no template assigned'], severity="warning")
             return
@@ -219,10 +305,7 @@ class EpisodeScreen(Screen):
         self.app.notify(that.tags, title=i18n['Tags copied to clipboard'])
 
     def _action_copy_text(self):
-        row_key, column_key = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate)
-        if not row_key:
-            return
-        this = Episode.as_Folge_by_uid(row_key.value)
+        this = self._cursor_episode()
         if not this:
             return
         text = create_description_text(this)
@@ -241,18 +324,14 @@ class EpisodeScreen(Screen):
             if not cur_episode:
                 return
             Episode.update_or_create(cur_episode)
-            self._refill_table_with_project(self.current_project)
+            self._update_episode_row(cur_episode.db_uid)
 
-        row_key, column_key = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate)
-        if row_key:
-            this = Episode.as_Folge_by_uid(row_key.value)
-            self.app.push_screen(AssignTemplate(this), template_callback)
+        this = self._cursor_episode()
+        if this:
+            self.app.push_screen(AssignTemplate(copy.copy(this)), template_callback)
 
     def action_open_episode_note(self):
-        row_key, column_key = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate)
-        if not row_key:
-            return
-        this = Episode.as_Folge_by_uid(row_key.value)
+        this = self._cursor_episode()
         if not this:
             return
 
@@ -262,129 +341,470 @@ class EpisodeScreen(Screen):
             if not isinstance(notice, Folge): # * hard type check
                 return
             Episode.update_or_create(notice)
+            self.episodes.pop(notice.db_uid, None)  # * next action reads it fresh
             self._create_markdown_breakdown() # update overview
-        self.app.push_screen(WriteNoteModal(this), note_callback)
+        self.app.push_screen(WriteNoteModal(copy.copy(this)), note_callback)
+
+    def _cursor_episode(self) -> Folge | None:
+        """
+        The episode of the row under the table cursor, taken from the rows loaded into the table
+        so the actions on it need no query. Edits that write back replace or drop the entry.
+        :return: Folge or None if the cursor is on no episode
+        """
+        if not self.entryview.row_count:
+            return None
+        row_key, column_key = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate)
+        if not row_key or row_key.value is None:
+            return None
+        this = self.episodes.get(row_key.value)
+        if not this:  # * should not happen, every row comes with its Folge
+            this = Episode.as_Folge_by_uid(row_key.value)
+            if this:
+                self.episodes[this.db_uid] = this
+        return this
+
+    def _jump_to_episode(self, db_uid: int) -> None:
+        """
+        Moves the cursor to an episode of the current project, if it is not loaded into the table
+        the window gets refilled starting with that episode
+        :param db_uid: DB UID of the episode
+        """
+        row_key = RowKey(db_uid)
+        if row_key not in self.entryview.rows:
+            this = Episode.as_Folge_by_uid(db_uid)
+            if not this or this.db_project != self.current_project:
+                return
+            start_at = (this.counter1, this.counter2, this.db_uid + 1)  # * keyset is exclusive, this includes it
+            self._fill_table(self.current_project, *self._fetch_project(self.current_project, start_at, self.PAGE_SIZE))
+        if row_key in self.entryview.rows:
+            self.entryview.move_cursor(row=self.entryview.get_row_index(row_key))
+            self.entryview.focus()
 
 
     def _refill_table_with_project(self,
            p_uid: int,
            rest_position: None | Literal['above', 'below', 'reset'] = None) -> None:
         """
-        Redraws the entire table with the new data from the database, if this project ever scales
-        I must probably look into how to update singular cells instead of brute forcing everything
-        everytime
+        Redraws the entire table with the new data from the database, used when switching projects,
+        edits of single episodes go through _update_episode_row instead
         :param p_uid:
         :param rest_position:
         :return:
         """
-        #* if Project ID is the same we preserve the cursor position
+        #* if Project ID is the same we preserve the cursor position and the loaded window
+        start_at = None
+        if p_uid == self.current_project and "counter1" in self.entryview.columns and self.entryview.row_count:
+            if self._more_above:
+                counter1, counter2, uid = self._row_position(0)
+                start_at = (counter1, counter2, uid + 1)  # * keyset is exclusive, this includes the old first row
+        if start_at:
+            self._fill_table(p_uid, *self._fetch_project(p_uid, start_at, self.PAGE_SIZE))
+        else:
+            self._fill_table(p_uid, *(project_cache.get(p_uid) or self._fetch_and_cache(p_uid)))
+
+    @staticmethod
+    def _fetch_project(p_uid: int, start_at: tuple[int, int] | None = None, page_size: int = 100) -> tuple:
+        """
+        All database work for showing a project, without touching any widget so it can run on a thread
+        :return: (first page, whether that page starts below the top, has_counter2, notes markdown)
+        """
+        data_ep = Episode.page_by_project(p_uid, start_at, page_size)
+        if not data_ep and start_at:  # everything above got deleted in the meantime
+            start_at = None
+            data_ep = Episode.page_by_project(p_uid, None, page_size)
+        compile_templates(each.db_template for each in data_ep)  # * copying text or tags then needs no query
+        return data_ep, start_at is not None, Project.has_counter2(p_uid), EpisodeScreen._notes_markdown(p_uid)
+
+    def _fill_table(self, p_uid: int | None, data_ep: list[Folge], more_above: bool, has_counter2: bool, notes: str) -> None:
+        """Rebuilds table and notes from what _fetch_project returned"""
         was_selected = None
-        if p_uid == self.current_project:
-            row_key, column_key = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate)
-            was_selected = row_key
-        # check if project exists
-        # get data
+        if p_uid == self.current_project and "counter1" in self.entryview.columns and self.entryview.row_count:
+            was_selected = self.entryview.coordinate_to_cell_key(self.entryview.cursor_coordinate).row_key
         self.entryview.clear(columns=True)
         self.entryview.show_header = True
         self.current_project = p_uid  # even for empty sets the project ID is still set
-        data_ep = Episode.by_project(p_uid, order="desc")
+        self._more_above = more_above
+        self._more_below = len(data_ep) >= self.PAGE_SIZE
+        self.episodes = {each.db_uid: each for each in data_ep}
+        self.query_one("#combined_view").document.update(notes)
         # display dummy text if none is present
         if not data_ep:
             self.entryview.show_header = False
             self.entryview.add_column("Message")
             self.entryview.add_row("No entries for this project")
-            return False
-        self.entryview.add_column("#")
+            return
+        self.entryview.add_column("#", key="counter1")
         self.entryview.add_column("##", key="counter2")
-        self.entryview.add_column(i18n['Session'])
-        self.entryview.add_column(i18n['Record Date'])
-        self.entryview.add_column(i18n['Title'])
-        self.entryview.add_column(i18n['Template'])
-        # TODO: concat template name into episode
+        self.entryview.add_column(i18n['Session'], key="session")
+        self.entryview.add_column(i18n['Record Date'], key="record_date")
+        self.entryview.add_column(i18n['Title'], key="title")
+        self.entryview.add_column(i18n['Template'], key="template")
         for each in data_ep:
-            template = each.db_template
-            if each.joined_template_title:
-                template = each.joined_template_title
-            self.entryview.add_row(
-                *[
-                    each.counter1,
-                    each.counter2,
-                    each.session,
-                    each.recording_date.strftime("%d.%m.%Y"),
-                    each.title,
-                    template
-                ],
-                key=each.db_uid
-            )
+            self.entryview.add_row(*self._episode_cells(each).values(), key=each.db_uid)
         # hide counter2 row when there are now values in there
-        if not Project.has_counter2(self.current_project):
-            self.entryview.remove_column("counter2")  # the only column with a key as of now
+        if not has_counter2:
+            self.entryview.remove_column("counter2")
         # highlight the previos cell, I have the sneaking suspicion that this will break somewhen
-        if was_selected and was_selected.value:
+        if was_selected and was_selected in self.entryview.rows:
             new_row = self.entryview.get_row_index(was_selected)
             self.entryview.move_cursor(row=new_row)
-        # generate a new markdown view for this project
-        self._create_markdown_breakdown()
+
+    def _row_position(self, row_index: int) -> tuple[int, int, int]:
+        """(counter1, counter2, id) of a row in the table, the keyset Episode.page_by_project continues from"""
+        row_key = self.entryview.coordinate_to_cell_key(Coordinate(row_index, 0)).row_key
+        # * without the column the project has no counter2 above 0
+        counter2 = self.entryview.get_cell(row_key, "counter2") if "counter2" in self.entryview.columns else 0
+        return self.entryview.get_cell(row_key, "counter1"), counter2, row_key.value
+
+    def _in_window(self, this: Folge) -> bool:
+        """If an episode falls into the part of the project that is currently loaded into the table"""
+        if not self.entryview.row_count:
+            return True
+        position = (this.counter1, this.counter2, this.db_uid)
+        if self._more_above and position > self._row_position(0):
+            return False
+        if self._more_below and position < self._row_position(self.entryview.row_count - 1):
+            return False
+        return True
+
+    def _load_page(self, direction: Literal['above', 'below']) -> int:
+        """
+        Fetches the next page of the current project above or below the rows in the table, then
+        drops rows from the other end so that no more than WINDOW_PAGES pages stay loaded. The
+        cursor and the visible part of the table stay on the same rows while this happens.
+        :param direction: which end of the table gets new rows
+        :return: number of rows added
+        """
+        table = self.entryview
+        selected = table.coordinate_to_cell_key(table.cursor_coordinate).row_key
+        if direction == "below":
+            page = Episode.page_by_project(self.current_project, self._row_position(table.row_count - 1),
+                                           self.PAGE_SIZE, "desc")
+            self._more_below = len(page) >= self.PAGE_SIZE
+        else:
+            page = Episode.page_by_project(self.current_project, self._row_position(0), self.PAGE_SIZE, "asc")
+            self._more_above = len(page) >= self.PAGE_SIZE
+        compile_templates(each.db_template for each in page)
+        has_counter2 = "counter2" in table.columns
+        added = 0
+        for each in page:
+            if RowKey(each.db_uid) in table.rows:  # * can happen with equal counter1 and a resort
+                continue
+            cells = self._episode_cells(each)
+            if not has_counter2:
+                del cells["counter2"]
+            table.add_row(*cells.values(), key=each.db_uid)
+            self.episodes[each.db_uid] = each
+            added += 1
+        if direction == "above" and added:
+            table.sort(*(("counter1", "counter2") if has_counter2 else ("counter1",)), reverse=True)
+        shift = added if direction == "above" else 0
+        surplus = table.row_count - self.PAGE_SIZE * self.WINDOW_PAGES
+        if surplus > 0:
+            if direction == "below":
+                drop = [table.coordinate_to_cell_key(Coordinate(i, 0)).row_key for i in range(surplus)]
+                self._more_above = True
+                shift = -surplus
+            else:
+                drop = [table.coordinate_to_cell_key(Coordinate(table.row_count - 1 - i, 0)).row_key
+                        for i in range(surplus)]
+                self._more_below = True
+            for row_key in drop:
+                table.remove_row(row_key)
+                self.episodes.pop(row_key.value, None)
+        if shift:
+            table.scroll_to(y=max(0, table.scroll_y + shift), animate=False, immediate=True)
+        if selected in table.rows:
+            table.move_cursor(row=table.get_row_index(selected), scroll=False)
+        return added
+
+    def _check_window(self, *args) -> None:
+        """Loads the next page once the cursor or the visible part of the table gets close to an end"""
+        table = self.entryview
+        if self._paging or self.current_project is None or "counter1" not in table.columns or not table.row_count:
+            return
+        top = int(table.scroll_y)
+        bottom = top + table.scrollable_content_region.height
+        self._paging = True  # * scrolling and moving the cursor in _load_page ends up here again
+        try:
+            if self._more_below and max(bottom, table.cursor_row) >= table.row_count - self.PAGE_MARGIN:
+                self._load_page("below")
+            elif self._more_above and min(top, table.cursor_row) <= self.PAGE_MARGIN:
+                self._load_page("above")
+        finally:
+            self._paging = False
+
+    @on(DataTable.RowHighlighted, "#entryview")
+    def _row_highlighted(self, message: DataTable.RowHighlighted) -> None:
+        self._check_window()
+
+    @staticmethod
+    def _episode_cells(this: Folge) -> dict:
+        """The cells of one table row by column key, in column order"""
+        return {
+            "counter1": this.counter1,
+            "counter2": this.counter2,
+            "session": this.session,
+            "record_date": this.recording_date.strftime("%d.%m.%Y"),
+            "title": this.title,
+            "template": this.joined_template_title if this.joined_template_title else this.db_template
+        }
+
+    def _update_episode_row(self, db_uid: int) -> None:
+        """
+        Brings the row of a single episode up to date after it was written to the database. Only
+        cells that actually changed get updated, a new episode is added and sorted into place and
+        the cursor stays on the row it was on. The whole table is only rebuilt if its columns have
+        to change.
+        :param db_uid: id of the episode that was just edited or created
+        :return:
+        """
+        table = self.entryview
+        this = Episode.as_Folge_by_uid(db_uid)
+        row_key = RowKey(db_uid)
+        notes_changed = self._note_entry(self.episodes.get(db_uid)) != self._note_entry(this)
+        if "counter1" not in table.columns:  # * still shows the placeholder of an empty project
+            self._refill_table_with_project(self.current_project)
+            return
+        if not this or this.db_project != self.current_project or not self._in_window(this):
+            # * deleted, moved to another project or out of the loaded part of the table
+            if row_key in table.rows:
+                table.remove_row(row_key)
+            self.episodes.pop(db_uid, None)
+            if notes_changed:
+                self._create_markdown_breakdown()
+            return
+        has_counter2 = "counter2" in table.columns
+        if this.counter2 > 0 and not has_counter2:  # the column has to appear again
+            self._refill_table_with_project(self.current_project)
+            return
+        self.episodes[db_uid] = this
+        cells = self._episode_cells(this)
+        if not has_counter2:
+            del cells["counter2"]
+
+        selected, _ = table.coordinate_to_cell_key(table.cursor_coordinate) if table.row_count else (None, None)
+        if row_key in table.rows:
+            changed = {column: value for column, value in cells.items() if table.get_cell(row_key, column) != value}
+            for column, value in changed.items():
+                table.update_cell(row_key, column, value, update_width=True)
+            resort = "counter1" in changed or "counter2" in changed
+            if "counter2" in changed and this.counter2 == 0 and not Project.has_counter2(self.current_project):
+                table.remove_column("counter2")
+        else:
+            table.add_row(*cells.values(), key=db_uid)
+            resort = True
+        if resort:
+            table.sort(*(("counter1", "counter2") if "counter2" in table.columns else ("counter1",)), reverse=True)
+        if selected is not None and selected in table.rows:
+            table.move_cursor(row=table.get_row_index(selected))
+        if notes_changed:
+            self._create_markdown_breakdown()
+
+    def _note_entry(self, this: Folge | None) -> tuple | None:
+        """What the notes summary shows of an episode of the current project, None if it shows nothing"""
+        if not this or not this.notes or this.db_project != self.current_project:
+            return None
+        return this.counter1, this.counter2, this.title, this.notes
 
     def redraw_project_tree(self, pre_select: int | None = None):
         """
-        Wastefully loads the entire tree from the database again to make sure its all there again
-        if something has changed
+        Loads the tree from the database again to make sure its all there again if something
+        has changed. Only the categories with their number of projects are read, the projects
+        of a category are loaded once it gets expanded. Categories that were open before are
+        opened again, categories come in the order of their newest project
         :param pre_select:
         :return: a dictionary with all leaflets
         """
+        expanded = {cat for cat, node in self.category_nodes.items() if node.is_expanded}
         self.projects.reset("")
         self.projects.root.expand()
-        #data = enrich_playlist_list(Project.dump())
-        data = Project.get_tree_as_playlist()
-        tree = {}
-        categories = Project.get_categories(ordered="DESC")
-        for cat in categories:
-            tree[cat] = {}
-            tree[cat]['root'] = self.projects.root.add(cat, expand=True)
-            for entry in data:
-                if entry.category == cat:
-                    leaf = tree[cat]['root'].add_leaf(str(entry.title), data={'db_uid': entry.db_uid, 'playlist': entry})
-                    tree[cat][entry.db_uid] = leaf
-        self.project_tree = tree # TODO: find a way to iterate over nodes of the tree instead
-
-    def _create_markdown_breakdown(self) -> bool:
-        # it might be more wise to create a separate database method that only retrieves records that actually do
-        # have content in the notes section
+        self.project_nodes = {}
+        self.category_nodes = {}
+        self._collapsed_categories = []
+        for cat, count in Project.get_category_summary():
+            cat_node = self._add_category(cat, count)
+            if cat in expanded:
+                self._load_category(cat_node)
+                cat_node.expand()
+
+    @staticmethod
+    def _category_label(category: str, count: int) -> str:
+        return f"{category} ({count})"
+
+    def _add_category(self, category: str, count: int) -> TreeNode:
+        """Adds a collapsed category without its projects, they come with _load_category"""
+        cat_node = self.projects.root.add(self._category_label(category, count), allow_expand=True,
+                                          data={'category': category, 'count': count, 'loaded': False})
+        self.category_nodes[category] = cat_node
+        return cat_node
+
+    def _count_category(self, cat_node: TreeNode, delta: int) -> None:
+        cat_node.data['count'] += delta
+        cat_node.set_label(self._category_label(cat_node.data['category'], cat_node.data['count']))
+
+    def _load_category(self, cat_node: TreeNode) -> None:
+        """Adds the projects of a category to the tree, does nothing if they are already there"""
+        category = cat_node.data['category']
+        if category in self._collapsed_categories:
+            self._collapsed_categories.remove(category)
+        if cat_node.data['loaded']:
+            return
+        entries = Project.get_tree_as_playlist(category) or []
+        for entry in entries:
+            self.project_nodes[entry.db_uid] = cat_node.add_leaf(
+                str(entry.title), data={'db_uid': entry.db_uid, 'playlist': entry})
+        cat_node.data['loaded'] = True
+        if cat_node.data['count'] != len(entries):
+            self._count_category(cat_node, len(entries) - cat_node.data['count'])
+
+    def _release_category(self, cat_node: TreeNode) -> None:
+        """Drops the project leaves of a category again, the category itself and its count stay"""
+        for child in cat_node.children:
+            self.project_nodes.pop(child.data['db_uid'], None)
+        cat_node.remove_children()
+        cat_node.data['loaded'] = False
+
+    def _release_collapsed_categories(self) -> None:
+        """Releases collapsed categories, least recently collapsed first, until the leaves fit the budget"""
+        while len(self.project_nodes) > self.TREE_LEAF_BUDGET and self._collapsed_categories:
+            cat_node = self.category_nodes.get(self._collapsed_categories.pop(0))
+            if cat_node and not cat_node.is_expanded:
+                self._release_category(cat_node)
+
+    @on(Tree.NodeExpanded, "#project_tree")
+    def _expand_category(self, message: Tree.NodeExpanded) -> None:
+        if message.node.data and 'category' in message.node.data:
+            self._load_category(message.node)
+
+    @on(Tree.NodeCollapsed, "#project_tree")
+    def _collapse_category(self, message: Tree.NodeCollapsed) -> None:
+        if not message.node.data or 'category' not in message.node.data:
+            return
+        category = message.node.data['category']
+        if message.node.data['loaded'] and category not in self._collapsed_categories:
+            self._collapsed_categories.append(category)
+        self._release_collapsed_categories()
+
+    @staticmethod
+    def _newer(this: Playlist, other: Playlist) -> bool:
+        """Tree order, newest episode first and projects without any episodes at the end"""
+        if this.opt_newest_episode is None:
+            return False
+        return other.opt_newest_episode is None or this.opt_newest_episode > other.opt_newest_episode
+
+    def _tree_upsert_project(self, this: Playlist, previous_category: str | None = None) -> TreeNode | None:
+        """
+        Brings a single project into the tree without rebuilding it. A new project gets added at its
+        place in its category, a renamed one only gets a new label and one that changed its category
+        is moved over, the category is created or removed as needed. Expansion states stay as they are,
+        for a category that is not loaded only its count changes.
+        :param this: the project as it is now in the database, db_uid must be set
+        :param previous_category: category the project was in before, only needed if its leaf is not loaded
+        :return: the leaf of the project, None if its category is not loaded
+        """
+        category = str(this.category)
+        node = self.project_nodes.get(this.db_uid)
+        if node:
+            previous: Playlist = node.data['playlist']
+            # * the modals do not know about the aggregates, they stay the same on an edit
+            this.opt_newest_episode = this.opt_newest_episode or previous.opt_newest_episode
+            this.opt_episode_count = this.opt_episode_count or previous.opt_episode_count
+            previous_category = node.parent.data['category']
+        if previous_category == category:
+            if node:
+                node.data = {'db_uid': this.db_uid, 'playlist': this}
+                if str(node.label) != str(this.title):
+                    node.set_label(str(this.title))
+            return node
+        if previous_category is not None:
+            self._tree_remove_project(this.db_uid, previous_category)
+        cat_node = self.category_nodes.get(category)
+        if not cat_node:
+            cat_node = self._add_category(category, 0)
+            cat_node.data['loaded'] = True  # * nothing in there yet that could be loaded
+            cat_node.expand()
+        self._count_category(cat_node, 1)
+        if not cat_node.data['loaded']:
+            return None
+        before = next((each for each in cat_node.children if self._newer(this, each.data['playlist'])), None)
+        node = cat_node.add_leaf(str(this.title), data={'db_uid': this.db_uid, 'playlist': this}, before=before)
+        self.project_nodes[this.db_uid] = node
+        return node
+
+    def _tree_remove_project(self, project_id: int, category: str | None = None) -> None:
+        """
+        Removes the leaf of a project, and its category with it if that was the last one in there
+        :param category: category of the project, only needed if its leaf is not loaded
+        """
+        node = self.project_nodes.pop(project_id, None)
+        if node:
+            cat_node = node.parent
+            node.remove()
+        else:
+            cat_node = self.category_nodes.get(category)
+        if cat_node is None:
+            return
+        self._count_category(cat_node, -1)
+        if cat_node.data['count'] <= 0:
+            self.category_nodes.pop(cat_node.data['category'], None)
+            if cat_node.data['category'] in self._collapsed_categories:
+                self._collapsed_categories.remove(cat_node.data['category'])
+            cat_node.remove()
+
+    @staticmethod
+    def _notes_markdown(project_id: int) -> str:
+        """The summary of all episode notes of a project, reads only the episodes that have one"""
         all_notes_md = f"# {i18n['Project Notes Summary']}\n"
         #! do the playlist notes here Alan
-        data_ep = Episode.by_project(self.current_project, order="desc") # maybe it would better to cache this
-        for each in data_ep:
-            if not each.notes:
-                continue
-            all_notes_md += f"### #{each.counter1}{f' (##{each.counter2})' if each.counter2 else ''} - {each.title}\n\n"
-            all_notes_md += each.notes + "\n"
-        note_md = self.query_one("#combined_view")
-        note_md.document.update(all_notes_md)
+        for counter1, counter2, title, notes in Episode.notes_by_project(project_id):
+            all_notes_md += f"### #{counter1}{f' (##{counter2})' if counter2 else ''} - {title}\n\n"
+            all_notes_md += notes + "\n"
+        return all_notes_md
 
+    def _create_markdown_breakdown(self) -> None:
+        note_md = self.query_one("#combined_view")
+        note_md.document.update(self._notes_markdown(self.current_project))
 
     def _select_project_tree_entry(self, project_id: int | None = None, fuzzy_name: str | None = None) -> bool:
         """
-        Uses the self.project_tree class variable to find the TreeNode that matches the given name
-        or data_id
+        Moves the tree cursor to the node of a project, found with the project_nodes map or for a
+        name with the first loaded leaf that carries it, categories get opened as needed
         :param int|None project_id: ID of the project that is in the project node
         :param str|None fuzzy_name: name of the node, will select the first match
         :return: bool, if something was selected or not
         """
-        if not project_id and not fuzzy_name:
-            return False
         if project_id:
-            for i, treeline in enumerate(self.projects._tree_lines, 1):
-                node = treeline.node
-                if node.data and 'db_uid' in node.data and node.data['db_uid'] == project_id:
-                    self.projects.move_cursor_to_line(i-1)
-                    return True
+            node = self.project_nodes.get(project_id)
+            if not node and (project := Project.as_Playlist_by_uid(project_id)):
+                cat_node = self.category_nodes.get(str(project.category))
+                if cat_node:  # * category is not loaded yet
+                    self._load_category(cat_node)
+                    node = self.project_nodes.get(project_id)
+        elif fuzzy_name:
+            node = next((each for each in self.project_nodes.values() if str(each.label) == fuzzy_name), None)
+        else:
+            return False
+        if not node:
             return False # if none was found
+        if not node.parent.is_expanded:
+            node.parent.expand()
+        # * move_cursor goes by node.line, which the tree only renumbers lazily after nodes were added,
+        # removed or expanded. Reading the public last_line does that renumbering (textual 3.0.0),
+        # without it a freshly loaded category puts the cursor on whatever line the node had before
+        _ = self.projects.last_line
+        self.projects.move_cursor(node)
+        return True
 
     def _init_data(self):
         """Retrieves data from database in bulk for first build of the view"""
         self.redraw_project_tree()
         last_edited = Project.get_last_edited()
         state = self._select_project_tree_entry(last_edited)
-        self._refill_table_with_project(last_edited)
-        self._create_markdown_breakdown()
+        if last_edited:
+            self._start_loading(last_edited)
+        else:  # * empty database, nothing of the previous data may stay on screen
+            self.workers.cancel_group(self, "project_load")
+            self._loading_project = None
+            self.entryview.loading = False
+            self._fill_table(None, [], False, False, "")
@@ -22,17 +22,23 @@ import datetime
 import os.path
 
 from textual import on, work
+from textual.worker import get_current_worker
 from textual.app import ComposeResult, SystemCommand
 from textual.binding import Binding
 from textual.containers import Vertical, Horizontal, ScrollableContainer
 from textual.widgets import DataTable, Footer, Tree, TabbedContent, TabPane, MarkdownViewer, TextArea, Button, Label, \
-    Checkbox
+    Checkbox, ProgressBar, Select
 from textual.screen import Screen
 from textual_fspicker import FileSave, FileOpen, Filters
 
 from episode_names.Modals.DialogueModals import YesNoBox
 from episode_names.Utility import i18n
-from episode_names.Utility.db_aux_utility import export_to_json, import_from_json, purge_all_user_data
+from episode_names.Utility.db import database_proxy, is_read_only
+from episode_names.Utility.db_aux_utility import (
+    export_to_json, import_from_json, merge_from_json, EXPORT_FORMATS, SQLITE_SUFFIXES
+)
+from episode_names.Utility.backup import get_backup_manager
+from episode_names.Utility.maintenance import run_maintenance, DEFAULT_MAINTENANCE, DESTRUCTIVE_MAINTENANCE
 
 class SettingsScreen(Screen):
     BINDINGS = [
@@ -47,27 +53,136 @@ class SettingsScreen(Screen):
         with ScrollableContainer():
             yield Label(i18n['The Settings Screen'])
             yield Button(label=i18n['Database2JSON Export'] ,id="export_json", classes="danger")
+            yield Select([(i18n[f'Export format {fmt}'], fmt) for fmt in EXPORT_FORMATS],
+                         value='json', allow_blank=False, id='export_format')
+            yield Checkbox(label=i18n['Compact export'], id='compact_export')
             yield Checkbox(label=i18n['Delete old data'], id='delete_old')
+            yield Checkbox(label=i18n['Merge into current data'], id='merge_import')
             yield Button(label=i18n['Database2JSON Import'] ,id="import_json", classes="danger")
+            yield Button(label=i18n['Database maintenance'], id="maintenance")
+            yield Button(label=i18n['Delete all data'], id="purge_data", classes="danger")
+            with Horizontal(id="transfer_status"):
+                yield ProgressBar(id="transfer_progress", show_eta=False)
+                yield Button(label=i18n['Cancel'], id="cancel_transfer")
 
     def on_mount(self) -> None:
-        pass
+        self._set_transfer_running(False)
+
+    def _set_transfer_running(self, running: bool) -> None:
+        """
+        Shows the progress bar and locks the buttons while an im- or export is running, everything
+        that writes stays locked for good under the read-only profile
+        """
+        writing_locked = running or is_read_only()
+        self.query_one("#transfer_status").display = running
+        self.query_one("#export_json").disabled = running
+        self.query_one("#import_json").disabled = writing_locked
+        self.query_one("#maintenance").disabled = writing_locked
+        self.query_one("#purge_data").disabled = writing_locked
+        if running:
+            self.query_one("#transfer_progress").update(total=None, progress=0)
+
+    def _report_progress(self, done: int, total: int) -> None:
+        """Called from the transfer thread, hands the numbers over to the event loop"""
+        self.app.call_from_thread(self.query_one("#transfer_progress").update, total=total, progress=done)
+
+    @on(Button.Pressed, "#cancel_transfer")
+    def _cancel_transfer(self) -> None:
+        self.workers.cancel_group(self, "transfer")
+
+    @work(thread=True, exclusive=True, group="transfer")
+    def _run_export(self, save_to: str, compact: bool, fmt: str = 'json') -> None:
+        worker = get_current_worker()
+        self.app.call_from_thread(self._set_transfer_running, True)
+        try:
+            status = export_to_json(save_to, compact=compact, fmt=fmt,
+                                    progress=self._report_progress, cancelled=lambda: worker.is_cancelled)
+        finally:
+            database_proxy.close()  # every thread gets its own connection
+            self.app.call_from_thread(self._set_transfer_running, False)
+        if worker.is_cancelled:
+            self.app.call_from_thread(self.notify, i18n['Export cancelled'])
+        elif status:
+            self.app.call_from_thread(self.notify, i18n['Export successful'])
+        else:
+            self.app.call_from_thread(self.notify, i18n['Export failed'])
+
+    @work(thread=True, exclusive=True, group="transfer")
+    def _run_import(self, open_from: str, purge_first: bool, merge: bool = False) -> None:
+        worker = get_current_worker()
+        self.app.call_from_thread(self._set_transfer_running, True)
+        try:
+            if merge:
+                counts = merge_from_json(open_from,
+                                         progress=self._report_progress, cancelled=lambda: worker.is_cancelled)
+                da_count = counts['inserted'] + counts['updated'] if counts else -1
+                if counts is None and not worker.is_cancelled:
+                    self.app.call_from_thread(self.notify, i18n['Import failed'], severity="error")
+                if counts:
+                    self.app.call_from_thread(self.notify, i18n.t('Merge result', {
+                        '%%I%%': counts['inserted'], '%%U%%': counts['updated'],
+                        '%%S%%': counts['unchanged'], '%%K%%': counts['kept']}))
+            else:
+                da_count = import_from_json(open_from, purge_first=purge_first,
+                                            progress=self._report_progress, cancelled=lambda: worker.is_cancelled)
+        finally:
+            database_proxy.close()
+            self.app.call_from_thread(self._set_transfer_running, False)
+        if worker.is_cancelled:
+            self.app.call_from_thread(self.notify, i18n['Import cancelled'])
+            return
+        if not merge:
+            self.app.call_from_thread(self.notify, f"We got {da_count} new entries")
+        if da_count > 0 or purge_first:
+            self.app.redraw_after_import = True, True  # redraw for both screens
+            # ? damnit, how to trigger an interface redraw on other screens?
+            # ? signals that trigger next time the screen is visible again?
+
+    @work(thread=True, exclusive=True, group="transfer")
+    def _run_maintenance(self, tasks: tuple[str, ...]) -> None:
+        """Same group as the im- and export, vacuuming in the middle of an import would not end well"""
+        self.app.call_from_thread(self._set_transfer_running, True)
+        try:
+            manager = get_backup_manager()
+            if manager and DESTRUCTIVE_MAINTENANCE.intersection(tasks) and not manager.backup_now():
+                # * without a fresh snapshot a purge could not be undone
+                self.app.call_from_thread(self.notify, i18n['Backup failed, nothing was purged'],
+                                          title=i18n['Database maintenance'], severity="error")
+                return
+            results = run_maintenance(tasks, progress=self._report_progress)
+        finally:
+            database_proxy.close()
+            self.app.call_from_thread(self._set_transfer_running, False)
+        report = "\n".join(str(each) for each in results)
+        severity = "information" if all(each.ok for each in results) else "error"
+        self.app.call_from_thread(self.notify, report, title=i18n['Database maintenance'], severity=severity)
+        if 'purge' in tasks:
+            self.app.redraw_after_import = True, True
+
+    @on(Button.Pressed, "#maintenance")
+    def _start_maintenance(self) -> None:
+        self._run_maintenance(DEFAULT_MAINTENANCE)
+
+    @on(Button.Pressed, "#purge_data")
+    @work
+    async def _confirm_purge(self) -> None:
+        if await self.app.push_screen_wait(YesNoBox(i18n['warning_purge_all_data'])):
+            self._run_maintenance(('purge', 'vacuum'))
 
     @on(Button.Pressed, "#export_json")
     @work
     async def select_save_path(self):
         now_str = datetime.date.today().isoformat()
+        fmt = self.query_one("#export_format").value
         if save_to := await self.app.push_screen_wait(FileSave(
                 location=self.home,
                 title=i18n['Export as'],
                 save_button=i18n['Save'],
                 cancel_button=i18n['Cancel'],
-                default_file=f"episode_export_{now_str}.json")
+                default_file=f"episode_export_{now_str}{EXPORT_FORMATS[fmt]}")
         ):
-            if export_to_json(str(save_to)):
-                self.notify(i18n['Export successful'])
-            else:
-                self.notify(i18n['Export failed'])
+            compact = self.query_one("#compact_export").value
+            self._run_export(str(save_to), compact, fmt)
 
     @on(Button.Pressed, "#import_json")
     @work
@@ -79,18 +194,17 @@ class SettingsScreen(Screen):
                 title=i18n['Export as'],
                 open_button=i18n['Open'],
                 cancel_button=i18n['Cancel'],
-                filters=Filters(("JSON", lambda p: p.suffix.lower() == ".json"), ("ALL", lambda _: True))
+                filters=Filters(
+                    ("Exports", lambda p: p.name.lower().endswith(tuple(EXPORT_FORMATS.values()) + SQLITE_SUFFIXES)),
+                    ("JSON", lambda p: p.suffix.lower() == ".json"),
+                    ("ALL", lambda _: True))
         )):
             self.app.notify(str(open_from))
             delete_checkbox = self.query_one("#delete_old")
-            if delete_checkbox.value:
-                purge_all_user_data(delete_checkbox.value)
-            da_count = import_from_json(open_from)
-            self.app.notify(f"We got {da_count} new entries")
-            if da_count > 0:
-                self.app.redraw_after_import = True, True  # redraw for both screens
-                # ? damnit, how to trigger an interface redraw on other screens?
-                # ? signals that trigger next time the screen is visible again?
+            merge_checkbox = self.query_one("#merge_import")
+            # * purging happens inside the import transaction, a cancelled import keeps the old data
+            # * merging matches existing records instead, deleting first would make it pointless
+            self._run_import(str(open_from), delete_checkbox.value and not merge_checkbox.value, merge_checkbox.value)
 
 
 
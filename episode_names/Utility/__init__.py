@@ -1,4 +1,4 @@
-from episode_names.Utility.command_palette import MenuProvider
+from episode_names.Utility.command_palette import MenuProvider, DescriptionProvider
 from episode_names.Utility.i18n import i18n
 from episode_names.Utility.order import user_setup
 
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2025 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Automatic snapshots of the database file with the sqlite3 online backup API.
+
+Everything happens on a daemon thread with its own connection, the UI never waits for it. The
+database runs in WAL mode so the backup only ever holds a read lock and the app can keep writing,
+a write in the middle of a backup simply makes sqlite start over with the next step. Edits are
+counted with the sequence of the ChangeLog, so nothing in the models has to know about backups.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+BACKUP_STAMP_FORMAT = "%Y-%m-%dT%H-%M-%S-%f"  # * microseconds, two snapshots in one second must not overwrite each other
+
+@dataclass(slots=True)
+class BackupSettings:
+    on_start: bool = True
+    on_exit: bool = True
+    every_edits: int = 50  # 0 disables backups while running
+    keep: int = 5  # number of snapshots kept next to the database, older ones get deleted
+    pages: int = 512  # pages copied per step, between steps other connections get their turn
+    step_pause: float = 0.005  # seconds
+    poll_interval: float = 30.0  # seconds between looks at the edit counter
+
+    @staticmethod
+    def from_config(config: dict) -> 'BackupSettings':
+        """Reads the backup_* keys of the config.json, missing keys keep their default"""
+        this = BackupSettings()
+        for key in ('on_start', 'on_exit', 'every_edits', 'keep'):
+            if f"backup_{key}" in config:
+                setattr(this, key, type(getattr(this, key))(config[f"backup_{key}"]))
+        return this
+
+def backup_files(db_path: Path | str) -> list[Path]:
+    """
+    All snapshots that belong to a database, oldest first
+
+    :param db_path: path of the live database
+    :return: list of paths, can be empty
+    """
+    db_path = Path(db_path)
+    return sorted(db_path.parent.glob(f"{db_path.stem}.backup-*{db_path.suffix}"))
+
+def rotate_backups(db_path: Path | str, keep: int) -> int:
+    """
+    Deletes the oldest snapshots until only `keep` remain
+
+    :return: number of deleted files
+    """
+    old = backup_files(db_path)[:-keep] if keep > 0 else backup_files(db_path)
+    for each in old:
+        try:
+            each.unlink()
+        except OSError as e:
+            logging.warning(f"Cannot remove old backup {each}: {e!r}")
+    return len(old)
+
+def snapshot_database(db_path: Path | str, pages: int = 512, step_pause: float = 0.0) -> Path | None:
+    """
+    Copies the database page by page into a new, time stamped file next to it. The copy is written
+    under a temporary name first, a snapshot that was interrupted never shows up as backup.
+
+    :param db_path: path of the live database
+    :param pages: pages copied per step
+    :param step_pause: sleep between two steps, gives writers room on large databases
+    :return: path of the finished snapshot or None if it failed
+    """
+    db_path = Path(db_path)
+    stamp = datetime.now().strftime(BACKUP_STAMP_FORMAT)
+    target_path = db_path.with_name(f"{db_path.stem}.backup-{stamp}{db_path.suffix}")
+    partial = target_path.with_name(target_path.name + ".part")
+
+    def step(status, remaining, total):
+        if step_pause and remaining:
+            time.sleep(step_pause)
+
+    if not db_path.is_file():
+        logging.error(f"Backup of {db_path} failed: no such database")
+        return None
+    source = target = None
+    try:
+        source = sqlite3.connect(db_path, timeout=10)
+        target = sqlite3.connect(partial)
+        source.backup(target, pages=pages, progress=step)
+        # * the copy inherits WAL mode, a backup should be a single file that restores by copying it back
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.close()
+        target = None
+        partial.replace(target_path)
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Backup of {db_path} failed: {e!r}")
+        if target:
+            target.close()
+        partial.unlink(missing_ok=True)
+        return None
+    finally:
+        if source:
+            source.close()
+    logging.info(f"Backup written to {target_path}")
+    return target_path
+
+class BackupManager:
+    """
+    Runs snapshots of one database on a background thread, at start, every n edits and at exit.
+
+    manager = BackupManager(db_path, BackupSettings())
+    manager.start()
+    ...
+    manager.stop()  # waits for a running snapshot and takes the final one
+    """
+    def __init__(self, db_path: Path | str, settings: BackupSettings | None = None):
+        self.db_path = Path(db_path)
+        self.settings = settings or BackupSettings()
+        self.last_backup: Path | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # one snapshot at a time
+        self._thread: threading.Thread | None = None
+        self._last_sequence = 0
+
+    def _edit_sequence(self) -> int:
+        """Highest sequence the ChangeLog ever handed out, survives pruning of the log"""
+        try:
+            con = sqlite3.connect(self.db_path.resolve().as_uri() + "?mode=ro", uri=True, timeout=5)
+            try:
+                row = con.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changelog'").fetchone()
+            finally:
+                con.close()
+        except sqlite3.Error as e:
+            logging.warning(f"Cannot read edit counter of {self.db_path}: {e!r}")
+            return self._last_sequence
+        return row[0] if row else 0
+
+    def backup_now(self) -> Path | None:
+        """Takes a snapshot and rotates, blocks the calling thread, use request_backup() from the UI"""
+        with self._lock:
+            sequence = self._edit_sequence()
+            path = snapshot_database(self.db_path, self.settings.pages, self.settings.step_pause)
+            if path:
+                self.last_backup = path
+                self._last_sequence = sequence
+                rotate_backups(self.db_path, self.settings.keep)
+            return path
+
+    def request_backup(self) -> None:
+        """Asks the background thread for a snapshot as soon as possible"""
+        self._last_sequence = -1
+        self._wake.set()
+
+    def _due(self) -> bool:
+        if self._last_sequence < 0:
+            return True
+        if self.settings.every_edits <= 0:
+            return False
+        return self._edit_sequence() - self._last_sequence >= self.settings.every_edits
+
+    def _run(self) -> None:
+        if self.settings.on_start:
+            self.backup_now()
+        else:
+            self._last_sequence = self._edit_sequence()
+        while not self._stop.is_set():
+            self._wake.wait(self.settings.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self._due():
+                self.backup_now()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="episode_names-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self, final_backup: bool | None = None) -> None:
+        """
+        Ends the background thread, by default takes one last snapshot if there were edits since
+        the previous one and settings.on_exit is set
+
+        :param final_backup: overrides settings.on_exit
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if final_backup is None:
+            final_backup = self.settings.on_exit
+        if final_backup and self._edit_sequence() != self._last_sequence:
+            self.backup_now()
+
+_manager: BackupManager | None = None
+
+def start_backups(db_path: Path | str, settings: BackupSettings | None = None) -> BackupManager:
+    """Starts the one backup manager of the app, a second call replaces the first"""
+    global _manager
+    if _manager:
+        _manager.stop(final_backup=False)
+    _manager = BackupManager(db_path, settings)
+    _manager.start()
+    return _manager
+
+def stop_backups() -> None:
+    global _manager
+    if _manager:
+        _manager.stop()
+        _manager = None
+
+def get_backup_manager() -> BackupManager | None:
+    return _manager
@@ -170,4 +170,38 @@ class MenuProvider(Provider):
         Or rather, I do understand _what_ it does, but not why.
         Apparently just a typechecking thing?
         """
-        return cast('episode_names', self.screen.app)
\ No newline at end of file
+        return cast('episode_names', self.screen.app)
+
+class DescriptionProvider(Provider):
+    """Finds episodes of the current project by the text their template renders for them"""
+    MIN_LENGTH = 3  # * shorter queries match nearly everything anyway
+    MAX_HITS = 20
+
+    async def search(self, query: str) -> Hits:
+        """Handle a request to search for commands that match the query.
+        Args:
+            query: The user input to be matched.
+        Yields:
+            One hit per episode whose description contains the query, selecting it jumps there.
+        """
+        from episode_names.Screens.EpisodesScreen import EpisodeScreen
+        from episode_names.Utility.db import Episode, RenderedDescription
+
+        screen = self.screen
+        query = query.strip()
+        if not isinstance(screen, EpisodeScreen) or not screen.current_project or len(query) < self.MIN_LENGTH:
+            return
+        found = RenderedDescription.search(query, screen.current_project, self.MAX_HITS)
+        titles = {uid: (counter1, title) for uid, counter1, title in (Episode
+                  .select(Episode.id, Episode.counter1, Episode.title)
+                  .where(Episode.id.in_([uid for uid, _ in found]))
+                  .tuples())}
+        for uid, text in found:
+            counter1, title = titles.get(uid, (0, ""))
+            start = max(0, text.lower().find(query.lower()) - 20)
+            yield Hit(
+                0.5,  # * below the commands of MenuProvider that match by name
+                i18n.t('Found Episode', {'%%C%%': counter1, '%%E%%': title}),
+                partial(screen._jump_to_episode, uid),
+                help=text[start:start + 80].replace("\n", " "),
+            )
@@ -20,7 +20,9 @@ from pydoc import describe
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
-from typing import Literal
+import logging
+import threading
+from typing import Iterable, Iterator, Literal
 
 from dataclasses import dataclass
 from datetime import datetime, date
@@ -34,11 +36,50 @@ from peewee import (
     Model,
     SqliteDatabase,
     TextField,
-    CharField, JOIN, fn, SQL
+    CharField, JOIN, fn, SQL, Tuple
 )
+from playhouse.sqlite_ext import AutoIncrementField
+
+from episode_names.Utility.templating import invalidate_compiled, compile_template, compiled_generation
+from episode_names.Utility.project_cache import invalidate_project
 
 database_proxy = DatabaseProxy()
 
+# * connection profiles, each is a complete set of pragmas that gets applied as a group
+# * cache_size is negative because sqlite then reads it as KiB instead of pages
+DB_PROFILES: dict[str, dict[str, str | int]] = {
+    'interactive': {  # default for the TUI, short transactions, reads while writing
+        'query_only': 0,  # * first, so switching away from read-only can change everything after it
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -16000,  # ~16 MiB
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+    },
+    'bulk-import': {  # trades durability for speed, a crash mid import might lose the import
+        'query_only': 0,
+        'journal_mode': 'wal',
+        'synchronous': 'off',
+        'cache_size': -64000,  # ~64 MiB
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'memory',
+        'busy_timeout': 10000,
+    },
+    'read-only': {  # for looking at a database without ever touching it
+        'journal_mode': 'wal',  # * every profile sets every key, so switching in any direction is the same
+        'synchronous': 'normal',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+        'query_only': 1,  # * last, the pragmas before it might still have to write
+    },
+}
+DEFAULT_DB_PROFILE = 'interactive'
+_configured_profile = DEFAULT_DB_PROFILE  # * the one init_db opened with, every new connection starts with it
+_switched_profile = threading.local()  # * (connection, profile) of a set_db_profile on this thread
+
 # TODO: find a better place for this
 def normalize_datetime(in_date: str | datetime | None = None) -> datetime | None:
     """
@@ -54,7 +95,7 @@ def normalize_datetime(in_date: str | datetime | None = None) -> datetime | None
         return None
     return in_date
 
-@dataclass
+@dataclass(slots=True)
 class Folge:
     title: str
     joined_template_title: str | None = None  # this feels not right
@@ -99,7 +140,33 @@ class Folge:
             create_date=this.create_date
         )
 
-@dataclass
+    @staticmethod
+    def from_row(row: tuple) -> 'Folge':
+        """
+        Builds the Folge directly from a cursor row without a model instance in between, the
+        columns must be in the order of Episode.folge_columns()
+        """
+        (title, template_title, counter1, counter2, session, description, notes,
+         record_date, uid, project_id, template_id, edit_date, create_date) = row
+        if not template_id or int(template_id) <= 0:
+            template_title = None
+        return Folge(
+            title=title,
+            joined_template_title=template_title,
+            counter1=counter1,
+            counter2=counter2,
+            session=session,
+            description=description,
+            notes=notes or None,  # empty note becomes Null
+            recording_date=record_date,
+            db_uid=uid,
+            db_project=project_id,
+            db_template=template_id,
+            edit_date=edit_date,
+            create_date=create_date
+        )
+
+@dataclass(slots=True)
 class Playlist:
     title: str
     category: str = ""
@@ -107,6 +174,7 @@ class Playlist:
 
     db_uid: int = 0
     opt_newest_episode: datetime | None = None # additional data for tree view
+    opt_episode_count: int | None = None # same
 
     @staticmethod
     def from_project(this: 'Project') -> 'Playlist':
@@ -122,6 +190,19 @@ class Playlist:
             db_uid=this.id
         )
 
+    @staticmethod
+    def from_row(row: tuple) -> 'Playlist':
+        """Same as from_project but from a (id, name, category, description[, newest[, count]]) cursor row"""
+        uid, title, category, description, *extra = row
+        return Playlist(
+            title=title,
+            category=category,
+            description=description,
+            opt_newest_episode=extra[0] if extra else None,
+            opt_episode_count=extra[1] if len(extra) > 1 else None,
+            db_uid=uid
+        )
+
     def __eq__(self, other: 'Playlist') -> bool:
         """
         Actually compares only the non-database parts against each other
@@ -145,12 +226,13 @@ class Playlist:
             return False
         return True
 
-@dataclass
+@dataclass(slots=True)
 class PatternTemplate:
     title: str
     pattern: str = ""
     tags: str = ""
     db_uid: int = 0
+    edit_date: datetime | None = None  # used to tell compiled versions apart
 
     @staticmethod
     def from_TextTemplate(this: 'TextTemplate') -> 'PatternTemplate':
@@ -158,7 +240,20 @@ class PatternTemplate:
             title=this.title,
             pattern=this.pattern,
             db_uid=this.id,
-            tags=this.tags  # TODO: implement tags database site
+            tags=this.tags,  # TODO: implement tags database site
+            edit_date=this.edit_date
+        )
+
+    @staticmethod
+    def from_row(row: tuple) -> 'PatternTemplate':
+        """Same as from_TextTemplate but from a (id, title, pattern, tags, edit_date) cursor row"""
+        uid, title, pattern, tags, edit_date = row
+        return PatternTemplate(
+            title=title,
+            pattern=pattern,
+            db_uid=uid,
+            tags=tags,
+            edit_date=edit_date
         )
 
 class BaseModel(Model):
@@ -175,20 +270,21 @@ class Project(BaseModel):
 
     @staticmethod
     def as_Playlist_by_uid(p_uid) -> Playlist:
-        try:
-            res = Project.get_by_id(p_uid)
-            return Playlist.from_project(res)
-        except Project.DoesNotExist:
+        res = Project.select(*Project.playlist_columns()).where(Project.id == p_uid).tuples().first()
+        if not res:
             return None
+        return Playlist.from_row(res)
+
+    @staticmethod
+    def playlist_columns() -> tuple:
+        """Columns in the order Playlist.from_row expects them"""
+        return Project.id, Project.name, Project.category, Project.description
 
     @staticmethod
     def dump() -> list[Playlist] or None:
-        res = Project.select()
-        if len(res) <= 0:
+        flood = [Playlist.from_row(each) for each in Project.select(*Project.playlist_columns()).tuples()]
+        if not flood:
             return None
-        flood = []
-        for each in res:
-            flood.append(Playlist.from_project(each))
         return flood
 
     @staticmethod
@@ -214,6 +310,30 @@ class Project(BaseModel):
             flood.append(str(each.category))
         return flood
 
+    @staticmethod
+    def get_category_summary() -> list[tuple[str, int]]:
+        """
+        Only the categories and how many projects are in each, enough to draw a tree with all
+        categories collapsed. Same order as get_categories(ordered="DESC"), but the newest edit
+        of every project is a lookup in the (project, edit_date) index instead of a join over
+        all episodes
+
+        SELECT category, COUNT(*) FROM (
+            SELECT category, (SELECT MAX(edit_date) FROM episode WHERE project_id = project.id) AS newest
+            FROM project)
+        GROUP BY category ORDER BY MAX(newest) DESC
+        :return: list of (category, number of projects)
+        """
+        newest = Episode.select(fn.Max(Episode.edit_date)).where(Episode.project_id == Project.id)
+        per_project = Project.select(Project.category, newest.alias("newest")).alias("per_project")
+        res = (Project
+               .select(per_project.c.category, fn.Count(SQL("*")))
+               .from_(per_project)
+               .group_by(per_project.c.category)
+               .order_by(fn.Max(per_project.c.newest).desc())
+               .tuples())
+        return [(str(category), count) for category, count in res]
+
     @staticmethod
     def get_last_edited():
         """
@@ -304,42 +424,45 @@ class Project(BaseModel):
             res = (Episode
                    .select(Episode.id)
                    .where(Episode.project_id == project_id)
-                   .where(Episode.counter2 > 0)
+                   .where(SQL("counter2 > 0"))  # literal, a bound 0 would not match the partial index
                    .limit(1))
             return bool(res.count())
         except Episode.DoesNotExist:  # this should never happen
             return None
 
     @staticmethod
-    def get_tree_as_playlist() -> list[Playlist] | None:
+    def get_tree_as_playlist(category: str | None = None) -> list[Playlist] | None:
         """
         Returns the same as dump() BUT ordered by the edit_date of the entries, starting
-        with the newest edit.
+        with the newest edit. Every Playlist also knows the number of its episodes.
+        With a category only the projects of that category, for a tree that loads its
+        categories when they are opened.
 
-        So, this does work, but I am still not entirely happy with it.
+        This is everything the project tree needs in one go, the categories are in here
+        as well: a category is as new as its newest project, so the order in which the
+        categories first show up in this list is the order of get_categories(ordered="DESC")
 
-        SELECT project.*, MAX(episode.edit_date) AS opt_newest_episode
+        SELECT project.*, MAX(episode.edit_date) AS opt_newest_episode, COUNT(episode.id)
         FROM project LEFT JOIN episode
         ON project.id = episode.project_id
         GROUP BY project.id, episode.project_id
         ORDER BY MAX(episode.edit_date) DESC
+        :param category: only projects of this category
         :return: list[Playlist]
         """
         try:
             res = (Project
-                   .select(Project.id,
-                     Project.name,
-                     Project.description,
-                     Project.category,
-                     fn.Max(Episode.edit_date).alias("opt_newest_episode"))
+                   .select(*Project.playlist_columns(),
+                     fn.Max(Episode.edit_date).alias("opt_newest_episode"),
+                     fn.Count(Episode.id).alias("opt_episode_count"))
                    .join(Episode, JOIN.LEFT_OUTER) #.join(Episode, on=(Episode.project_id == Project.id))
                    .group_by(Project.id, Episode.project_id)
                    .order_by(fn.Max(Episode.edit_date).desc())
+                   .tuples()
                    )
-            flood = []
-            for each in res:
-                flood.append(Playlist.from_project(each))
-            return flood
+            if category is not None:
+                res = res.where(Project.category == category)
+            return [Playlist.from_row(each) for each in res]
         except Project.DoesNotExist:
             return None
 
@@ -364,20 +487,34 @@ class TextTemplate(BaseModel):
 
     @staticmethod
     def as_PTemplate_by_uid(uid: int) -> PatternTemplate | None:
-        try:
-            res = TextTemplate.get_by_id(uid)
-            return PatternTemplate.from_TextTemplate(res)
-        except TextTemplate.DoesNotExist:
+        res = (TextTemplate
+               .select(*TextTemplate.template_columns())
+               .where(TextTemplate.id == uid)
+               .tuples()
+               .first())
+        if not res:
             return None
+        return PatternTemplate.from_row(res)
+
+    @staticmethod
+    def by_uids(uids: list[int]) -> list[PatternTemplate]:
+        """All templates with the given ids in one query, unknown ids are silently missing"""
+        if not uids:
+            return []
+        res = TextTemplate.select(*TextTemplate.template_columns()).where(TextTemplate.id.in_(uids)).tuples()
+        return [PatternTemplate.from_row(each) for each in res]
+
+    @staticmethod
+    def template_columns() -> tuple:
+        """Columns in the order PatternTemplate.from_row expects them"""
+        return TextTemplate.id, TextTemplate.title, TextTemplate.pattern, TextTemplate.tags, TextTemplate.edit_date
 
     @staticmethod
     def dump() -> list[PatternTemplate] | None:
-        res = TextTemplate.select().where(TextTemplate.id > 0)
-        if len(res) <= 0:
+        res = TextTemplate.select(*TextTemplate.template_columns()).where(TextTemplate.id > 0).tuples()
+        flood = [PatternTemplate.from_row(each) for each in res]
+        if not flood:
             return None
-        flood = []
-        for each in res:
-            flood.append(PatternTemplate.from_TextTemplate(each))
         return flood
 
     @staticmethod
@@ -398,6 +535,11 @@ class TextTemplate(BaseModel):
     def update_or_create(this: PatternTemplate) -> int:
         if this.db_uid <= 0:
             return TextTemplate.create_new(this)
+        old_pattern, old_edit = (TextTemplate
+                                 .select(TextTemplate.pattern, TextTemplate.edit_date.cast("TEXT"))
+                                 .where(TextTemplate.id == this.db_uid)
+                                 .tuples()
+                                 .first()) or (None, None)
         res = (TextTemplate
                .update(
                 title=this.title,
@@ -407,6 +549,12 @@ class TextTemplate(BaseModel):
                 )
                .where(TextTemplate.id == this.db_uid)
                .execute())
+        invalidate_compiled(this.db_uid)  # * after the write, a compile in between would cache the old pattern again
+        # * the template title shows up in the episode lists of every project using it, invalidated only
+        # after the write so a load running meanwhile cannot cache the old title as current
+        invalidate_project()
+        if res:
+            RenderedDescription.template_changed(this.db_uid, old_pattern, old_edit)
         return res
 
     @staticmethod
@@ -455,44 +603,122 @@ class Episode(BaseModel):
     edit_date = DateTimeField(default=datetime.now)
     create_date = DateTimeField(default=datetime.now)
 
+    class Meta:
+        # * created with IF NOT EXISTS by create_tables, so existing databases get them on next start
+        indexes = (
+            (('project', 'counter1'), False),  # by_project, get_latest
+            (('project', 'edit_date'), False),  # MAX(edit_date) per project for the tree
+        )
+
+    @staticmethod
+    def folge_columns() -> tuple:
+        """Columns in the order Folge.from_row expects them"""
+        return (Episode.title, TextTemplate.title, Episode.counter1, Episode.counter2, Episode.session,
+                Episode.description, Episode.notes, Episode.record_date, Episode.id, Episode.project_id,
+                Episode.template_id, Episode.edit_date, Episode.create_date)
+
+    @staticmethod
+    def _with_template():
+        """
+        Base select for everything that becomes a Folge, the template title comes along in the
+        same query and the rows come back as plain tuples for Folge.from_row
+        """
+        return (Episode
+                .select(*Episode.folge_columns())
+                .join(TextTemplate, JOIN.LEFT_OUTER)
+                .tuples())
+
     @staticmethod
     def as_Folge_by_uid(uid: int) -> Folge or None:
-        try:
-            res = Episode.get_by_id(uid)
-            return Folge.from_episode(res)
-        except Episode.DoesNotExist:
+        res = Episode._with_template().where(Episode.id == uid).first()
+        if not res:
             return None
+        return Folge.from_row(res)
 
     @staticmethod
     def by_project(project_id: int, order: Literal['asc', 'desc'] = "asc") -> list[Folge] | None:
         if order == "asc":
-            res = (Episode.select().join(TextTemplate, JOIN.LEFT_OUTER)
-                   .order_by(Episode.counter1.asc())
-                   .where(Episode.project_id == project_id))
+            sorting = Episode.counter1.asc()
         else:
-            res = (Episode.select().join(TextTemplate, JOIN.LEFT_OUTER)
-                   .order_by(Episode.counter1.desc())
-                   .where(Episode.project_id == project_id))
-        if len(res) <= 0:
+            sorting = Episode.counter1.desc()
+        res = (Episode._with_template()
+               .where(Episode.project_id == project_id)
+               .order_by(sorting))
+        qua_water = [Folge.from_row(each) for each in res]
+        if not qua_water:
             return None
-        qua_water = []
-        for each in res:
-            qua_water.append(Folge.from_episode(each))
         return qua_water
 
+    @staticmethod
+    def notes_by_project(project_id: int) -> list[tuple[int, int, str, str]]:
+        """
+        Only the episodes of a project that have a note, and only what the notes summary shows,
+        newest counter first. Much cheaper than by_project for a large project with a few notes
+
+        :return: list of (counter1, counter2, title, notes)
+        """
+        return list(Episode
+                    .select(Episode.counter1, Episode.counter2, Episode.title, Episode.notes)
+                    .where(Episode.project_id == project_id, Episode.notes.is_null(False), Episode.notes != "")
+                    .order_by(Episode.counter1.desc(), Episode.counter2.desc())
+                    .tuples())
+
+    @staticmethod
+    def iter_by_project(project_id: int, order: Literal['asc', 'desc'] = "asc") -> Iterator[Folge]:
+        """
+        Same as by_project but yields the episodes one by one without caching the result set,
+        meant for exports of huge projects
+        """
+        if order == "asc":
+            sorting = Episode.counter1.asc()
+        else:
+            sorting = Episode.counter1.desc()
+        res = (Episode._with_template()
+               .where(Episode.project_id == project_id)
+               .order_by(sorting))
+        for each in res.iterator():
+            yield Folge.from_row(each)
+
+    @staticmethod
+    def page_by_project(project_id: int,
+                        after: tuple[int, int, int] | None = None,
+                        limit: int = 100,
+                        order: Literal['asc', 'desc'] = "desc") -> list[Folge]:
+        """
+        One page of a project with keyset pagination. Instead of an OFFSET the next page starts
+        right after the (counter1, counter2, id) of the last row of the previous one, which sqlite
+        finds with a seek in the (project_id, counter1) index, page 100 costs as much as page 1.
+        Pages are in the same order the episode table sorts by, counter1 then counter2.
+
+        :param project_id:
+        :param after: (counter1, counter2, id) of the row the page starts after, None for the first page
+        :param limit: page size
+        :param order: 'desc' walks from the newest episode down, 'asc' up
+        :return: list of Folge, empty after the last page
+        """
+        position = Tuple(Episode.counter1, Episode.counter2, Episode.id)
+        res = Episode._with_template().where(Episode.project_id == project_id)
+        if order == "asc":
+            if after:
+                res = res.where(position > Tuple(*after))
+            res = res.order_by(Episode.counter1.asc(), Episode.counter2.asc(), Episode.id.asc())
+        else:
+            if after:
+                res = res.where(position < Tuple(*after))
+            res = res.order_by(Episode.counter1.desc(), Episode.counter2.desc(), Episode.id.desc())
+        return [Folge.from_row(each) for each in res.limit(limit)]
+
     @staticmethod
     def get_latest(project_id: int) -> Folge | None:
         """Returns the episode with the highest counter1 among the current project"""
-        try:
-            res = (Episode
-                   .select()
-                   .where(Episode.project == project_id)
-                   .order_by(Episode.counter1.desc())
-                   .limit(1)
-                   .get())
-            return Folge.from_episode(res)
-        except Episode.DoesNotExist:
+        res = (Episode._with_template()
+               .where(Episode.project == project_id)
+               .order_by(Episode.counter1.desc())
+               .first())
+        if not res:
             return None
+        return Folge.from_row(res)
+
     @staticmethod
     def update_or_create(this: Folge) -> int:
         """
@@ -504,6 +730,7 @@ class Episode(BaseModel):
             return Episode.create_new(this)
         if not this.notes: # any none type becomes Null
             this.notes = None
+        previous_project = Episode.select(Episode.project_id).where(Episode.id == this.db_uid).scalar()
         res = (Episode
                .update(
                 title=this.title,
@@ -519,6 +746,11 @@ class Episode(BaseModel):
                 )
                .where(Episode.id == this.db_uid)
                .execute())
+        # * only after the write, a load running meanwhile could otherwise cache the old rows as current
+        if previous_project is not None and previous_project != this.db_project:
+            invalidate_project(previous_project)  # the episode moved over to another project
+        invalidate_project(this.db_project)
+        RenderedDescription.refresh(Episode.id == this.db_uid)
         return res
 
     @staticmethod
@@ -536,6 +768,8 @@ class Episode(BaseModel):
             template_id=this.db_template,
             project_id=this.db_project
         ).execute())
+        invalidate_project(this.db_project)  # * after the write, see update_or_create
+        RenderedDescription.refresh(Episode.id == res)
         return res
 
     @staticmethod
@@ -566,23 +800,309 @@ class Episode(BaseModel):
             edit_date=edit_date,
             create_date=create_date
         ).execute())
+        invalidate_project(project_id)  # * after the write, see update_or_create
         return res
 
+# * partial index, only the few episodes with a second counter end up in there, used by has_counter2
+Episode.add_index(
+    Episode.index(Episode.project, Episode.counter2, name="episode_project_id_counter2_partial")
+    .where(SQL("counter2 > 0"))  # sqlite does not allow parameters in here
+)
+
+class RenderedDescription(BaseModel):
+    """
+    The description of every episode as its template renders it, so searching or reading the
+    texts of many episodes is a plain read. This is derived data only: Episode.update_or_create
+    and TextTemplate.update_or_create keep it current. A row whose episode or template got changed
+    some other way (imports, sync) no longer matches their edit_date and is ignored by all
+    readers, refresh_stale() renders those again.
+    """
+    episode = ForeignKeyField(Episode, primary_key=True, lazy_load=True)
+    template = ForeignKeyField(TextTemplate, lazy_load=True)
+    # * edit_date of episode and template the text was rendered from, as the text sqlite stores
+    # them in, they are only compared and never parsed
+    episode_edit = TextField()
+    template_edit = TextField()
+    text = TextField()
+
+    CHUNK = 500  # ids per IN (...), stays far below the variable limit of sqlite
+
+    @staticmethod
+    def _current():
+        """Base select of all rows that still match their episode and template"""
+        return (RenderedDescription
+                .select(RenderedDescription.episode_id, RenderedDescription.text)
+                .join(Episode, on=((Episode.id == RenderedDescription.episode_id)
+                                   & (Episode.template_id == RenderedDescription.template_id)
+                                   & (Episode.edit_date == RenderedDescription.episode_edit)))
+                .join_from(RenderedDescription, TextTemplate,
+                           on=((TextTemplate.id == RenderedDescription.template_id)
+                               & (TextTemplate.edit_date == RenderedDescription.template_edit)))
+                .tuples())
+
+    @staticmethod
+    def by_episodes(episode_ids: Iterable[int]) -> dict[int, str]:
+        """
+        The rendered texts of the given episodes, episodes without template or without an up to
+        date row are missing from the result and have to be rendered by the caller
+
+        :param episode_ids: DB UIDs of episodes
+        :return: dict of episode id: text
+        """
+        episode_ids = list(episode_ids)
+        texts = {}
+        if not RenderedDescription.table_exists():  # * older database opened read-only
+            return texts
+        for i in range(0, len(episode_ids), RenderedDescription.CHUNK):
+            chunk = episode_ids[i:i + RenderedDescription.CHUNK]
+            texts.update(RenderedDescription._current().where(RenderedDescription.episode_id.in_(chunk)))
+        return texts
+
+    @staticmethod
+    def with_text(query):
+        """
+        Adds the rendered text to a select on Episode as column 'rendered', None where the episode
+        has no template or no up to date row
+
+        :param query: Episode.select(...) without joins on TextTemplate
+        :return: the extended query
+        """
+        if not RenderedDescription.table_exists():  # * older database opened read-only
+            return query.select_extend(SQL("NULL").alias('rendered'))
+        return (query
+                .select_extend(RenderedDescription.text.alias('rendered'))
+                .join(TextTemplate, JOIN.LEFT_OUTER, on=(TextTemplate.id == Episode.template_id))
+                .join_from(Episode, RenderedDescription, JOIN.LEFT_OUTER,
+                           on=((RenderedDescription.episode_id == Episode.id)
+                               & (RenderedDescription.template_id == Episode.template_id)
+                               & (RenderedDescription.episode_edit == Episode.edit_date)
+                               & (RenderedDescription.template_edit == TextTemplate.edit_date))))
+
+    @staticmethod
+    def search(text: str, project_id: int | None = None, limit: int | None = None) -> list[tuple[int, str]]:
+        """
+        Episodes whose rendered description contains the text, case insensitive like LIKE is
+
+        :param project_id: only search in this project
+        :param limit: at most this many results
+        :return: list of (episode id, text) ordered like the episode table of a project
+        """
+        if not RenderedDescription.table_exists():  # * older database opened read-only, render instead
+            condition = Episode.project_id == project_id if project_id is not None else SQL("1")
+            needle = text.lower()
+            found = [(uid, rendered) for uid, _, _, _, rendered in RenderedDescription._render(condition)
+                     if needle in rendered.lower()]
+            return found[:limit] if limit else found
+        query = (RenderedDescription._current()
+                 .where(RenderedDescription.text.contains(text))
+                 .order_by(Episode.counter1.desc(), Episode.counter2.desc(), Episode.id.desc()))
+        if project_id is not None:
+            query = query.where(Episode.project_id == project_id)
+        if limit:
+            query = query.limit(limit)
+        return list(query)
+
+    @staticmethod
+    def _render(condition) -> list[tuple]:
+        """
+        Renders the episodes with a template that match the condition, in the order of the episode table
+
+        :return: list of (episode id, template id, episode edit_date, template edit_date, text)
+        """
+        # * edit dates stay strings, parsing them would cost more than the rendering
+        rows = list(Episode
+                    .select(Episode.id, Episode.template_id, Episode.title, Episode.counter1, Episode.counter2,
+                            Episode.session, Episode.record_date,
+                            Episode.edit_date.cast("TEXT"), TextTemplate.edit_date.cast("TEXT"))
+                    .join(TextTemplate)  # * inner join, without template there is nothing to render
+                    .where(condition & (Episode.template_id > 0))
+                    .order_by(Episode.counter1.desc(), Episode.counter2.desc(), Episode.id.desc())
+                    .tuples())
+        generation = compiled_generation()
+        compiled = {each.db_uid: compile_template(each, generation)  # * a template already compiled is not compiled again
+                    for each in TextTemplate.by_uids(list({row[1] for row in rows}))}
+        data = []
+        for uid, template_id, title, counter1, counter2, session, record_date, episode_edit, template_edit in rows:
+            this = Folge(title, counter1=counter1, counter2=counter2, session=session, recording_date=record_date)
+            data.append((uid, template_id, episode_edit, template_edit, compiled[template_id].render(this)))
+        return data
+
+    @staticmethod
+    def refresh(condition) -> int:
+        """
+        Renders the episodes matching the condition again and replaces their rows, all in one
+        transaction. Episodes without a template (template_id 0, like everywhere else) lose their row.
+
+        :param condition: peewee expression on Episode, like Episode.template_id == 3
+        :return: number of rendered episodes
+        """
+        fields = [RenderedDescription.episode, RenderedDescription.template, RenderedDescription.episode_edit,
+                  RenderedDescription.template_edit, RenderedDescription.text]
+        # * one prepared statement for all rows, insert_many spends more time building the SQL than sqlite inserting
+        insert = (f"INSERT INTO {RenderedDescription._meta.table_name} "
+                  f"({', '.join(each.column_name for each in fields)}) VALUES ({', '.join('?' * len(fields))})")
+        # * reading and writing in one write transaction, an edit in between would otherwise get its
+        # fresh row replaced with one rendered from what was read before it
+        with database_proxy.atomic('IMMEDIATE'):
+            data = RenderedDescription._render(condition)
+            (RenderedDescription
+             .delete()
+             .where(RenderedDescription.episode_id.in_(Episode.select(Episode.id).where(condition)))
+             .execute())
+            database_proxy.cursor().executemany(insert, data)
+        return len(data)
+
+    @staticmethod
+    def refresh_stale() -> int:
+        """
+        Renders every episode with a template that has no up to date row, after imports or for
+        databases from before this table existed
+
+        :return: number of rendered episodes
+        """
+        current = RenderedDescription._current().select(RenderedDescription.episode_id)
+        return RenderedDescription.refresh(Episode.id.not_in(current))
+
+    @staticmethod
+    def template_changed(template_id: int, old_pattern: str | None, old_edit: str | None) -> int:
+        """
+        Called after a template was written, only a changed pattern needs rendering again. For a
+        new title or tags the rows that were current stay valid, they only get the new edit_date.
+
+        :param old_pattern: pattern before the write
+        :param old_edit: edit_date before the write, as text
+        :return: number of rendered or carried over rows
+        """
+        pattern, new_edit = (TextTemplate
+                             .select(TextTemplate.pattern, TextTemplate.edit_date.cast("TEXT"))
+                             .where(TextTemplate.id == template_id)
+                             .tuples()
+                             .first()) or (None, None)
+        if old_pattern == pattern:
+            return (RenderedDescription
+                    .update(template_edit=new_edit)
+                    .where(RenderedDescription.template_id == template_id,
+                           RenderedDescription.template_edit == old_edit)
+                    .execute())
+        return RenderedDescription.refresh(Episode.template_id == template_id)
+
 class Settings(BaseModel):
         key = TextField()
         value = TextField()
 
-def init_db(db_path="episoden_names.db"):
+class ChangeLog(BaseModel):
+    """
+    Filled by triggers only, every insert, update and delete on the user data tables leaves a row
+    here. seq never gets reused (AUTOINCREMENT), so 'everything after seq X' is a stable question.
+    """
+    seq = AutoIncrementField()
+    table_name = CharField()
+    row_id = IntegerField()
+    operation = CharField()  # insert, update, delete
+    changed_at = DateTimeField(constraints=[SQL("DEFAULT CURRENT_TIMESTAMP")])
+
+    class Meta:
+        indexes = (
+            (('table_name', 'seq'), False),
+        )
+
+    TRACKED = ('project', 'texttemplate', 'episode')  # table names of Project, TextTemplate, Episode
+
+    @staticmethod
+    def create_triggers() -> None:
+        """Creates the logging triggers, does nothing if they already exist"""
+        for table in ChangeLog.TRACKED:
+            for operation, ref in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+                database_proxy.execute_sql(
+                    f"CREATE TRIGGER IF NOT EXISTS changelog_{table}_{operation} "
+                    f"AFTER {operation.upper()} ON {table} FOR EACH ROW BEGIN "
+                    f"INSERT INTO changelog (table_name, row_id, operation) "
+                    f"VALUES ('{table}', {ref}.id, '{operation}'); END"
+                )
+
+    @staticmethod
+    def current_sequence() -> int:
+        """
+        Highest sequence number so far, 0 for an empty log. Also 0 for an older database opened
+        read-only, init_db could not add the table there.
+        """
+        if not ChangeLog.table_exists():
+            return 0
+        # * sqlite_sequence remembers the highest seq even after a prune emptied the log
+        row = database_proxy.execute_sql("SELECT seq FROM sqlite_sequence WHERE name = 'changelog'").fetchone()
+        return max(row[0] if row else 0, ChangeLog.select(fn.Max(ChangeLog.seq)).scalar() or 0)
+
+    @staticmethod
+    def first_available() -> int:
+        """Lowest sequence number a delta can still start from, everything up to it was pruned"""
+        oldest = ChangeLog.select(fn.Min(ChangeLog.seq)).scalar()
+        if oldest is None:
+            return ChangeLog.current_sequence()
+        return oldest - 1
+
+    @staticmethod
+    def changed_ids(model, since_seq: int, until_seq: int | None = None):
+        """Subquery of the ids of the given model that changed after since_seq (and up to until_seq)"""
+        query = (ChangeLog
+                 .select(ChangeLog.row_id)
+                 .where(ChangeLog.table_name == model._meta.table_name, ChangeLog.seq > since_seq))
+        if until_seq is not None:
+            query = query.where(ChangeLog.seq <= until_seq)
+        return query
+
+    @staticmethod
+    def prune(until_seq: int) -> int:
+        """Removes everything up to and including until_seq, once no one needs a delta from before that"""
+        return ChangeLog.delete().where(ChangeLog.seq <= until_seq).execute()
+
+def set_db_profile(profile: str = DEFAULT_DB_PROFILE) -> bool:
+    """
+    Applies one of the DB_PROFILES to the connection of the calling thread, can be used to switch
+    to 'bulk-import' for the duration of an import and back again afterwards. Every thread has its
+    own connection, the others and every connection opened later keep the profile of init_db. Must
+    not be called inside a transaction as the journal mode cannot be changed there.
+
+    :param profile: key of DB_PROFILES
+    :return: False if the profile is unknown
+    """
+    if profile not in DB_PROFILES:
+        return False
+    for key, value in DB_PROFILES[profile].items():
+        database_proxy.pragma(key, value)
+    _switched_profile.state = (database_proxy.connection(), profile)
+    return True
+
+def get_db_profile() -> str:
+    """Name of the profile the connection of the calling thread runs with"""
+    state = getattr(_switched_profile, 'state', None)
+    if state and state[0] is database_proxy.connection():  # * a reconnect starts over with the configured one
+        return state[1]
+    return _configured_profile
+
+def is_read_only() -> bool:
+    """If the current connection must not write, everything that would is refused up front"""
+    return bool(DB_PROFILES[get_db_profile()].get('query_only'))
+
+def init_db(db_path="episoden_names.db", profile: str = DEFAULT_DB_PROFILE):
     """
     Creates a new db or connects to one if the name exists
     :param str db_path: path to database
+    :param str profile: name of the connection profile in DB_PROFILES, unknown names fall back to the default
     :return:
     """
-    db = SqliteDatabase(db_path)
+    if profile not in DB_PROFILES:
+        logging.warning(f"Unknown database profile '{profile}', using '{DEFAULT_DB_PROFILE}'")
+        profile = DEFAULT_DB_PROFILE
+    global _configured_profile
+    db = SqliteDatabase(db_path, pragmas=DB_PROFILES[profile])
     database_proxy.initialize(db)
+    _configured_profile = profile
 
     db.connect()
-    db.create_tables([Episode, Project, TextTemplate, Settings])
+    if DB_PROFILES[profile].get('query_only'):
+        return  # a read-only connection cannot create anything
+    db.create_tables([Episode, Project, TextTemplate, RenderedDescription, Settings, ChangeLog])
+    ChangeLog.create_triggers()
 
 if __name__ == "__main__":
     init_db("../../test.db")
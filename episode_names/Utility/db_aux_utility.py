@@ -27,152 +27,685 @@ with it. For "now"(tm) this is im & export of data
 import json
 import logging
 from datetime import datetime, date
+import gzip
+import io
+import lzma
+import sqlite3
+from contextlib import contextmanager
 from json import JSONDecodeError
 from pathlib import Path
+from typing import Callable, Iterator, TextIO
 
-from episode_names.Utility.db import Episode, TextTemplate, Project, Settings, Playlist, normalize_datetime
+from peewee import fn, PeeweeException
 
+from episode_names.Utility.db import (
+    Episode, TextTemplate, Project, Settings, Playlist, Folge, ChangeLog, RenderedDescription, normalize_datetime,
+    database_proxy, get_db_profile, set_db_profile, is_read_only
+)
+from episode_names.Utility.json_stream import JsonStreamReader, JsonLinesReader
+from episode_names.Utility.order import create_description_text
+from episode_names.Utility.templating import invalidate_compiled
+from episode_names.Utility.project_cache import invalidate_project
 
-def export_to_json(file_path: Path | str = "export.json") -> bool:
+
+EXPORT_VERSION = "0.0.7"
+EXPORT_CHUNK_SIZE = 500  # rows fetched from the cursor at once
+
+def _iso(value):
+    """Dates sometimes come back as strings out of sqlite, this makes sure it is always isoformat"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _project_record(row: dict) -> dict:
+    return {
+        'uid': row['id'],
+        'name': row['name'],
+        'category': row['category'],
+        'description': row['description'],
+        'edit_date': _iso(row['edit_date']),
+        'create_date': _iso(row['create_date'])
+    }
+
+def _template_record(row: dict) -> dict:
+    return {
+        'uid': row['id'],
+        'title': row['title'],
+        'pattern': row['pattern'],
+        'tags': row['tags'],
+        'edit_date': _iso(normalize_datetime(row['edit_date'])),
+        'create_date': _iso(normalize_datetime(row['create_date']))
+    }
+
+def _episode_record(row: dict) -> dict:
+    return {
+        'uid': row['id'],
+        'edit_date': _iso(row['edit_date']),
+        'create_date': _iso(row['create_date']),
+        'title': row['title'],
+        'counter1': row['counter1'],
+        'counter2': row['counter2'],
+        'record_date': _iso(row['record_date']),
+        'session': row['session'],
+        'description': row['description'],
+        'notes': row['notes'],
+        'template': row['template'],
+        'project': row['project']
+    }
+
+def _exported_episode_record(row: dict) -> dict:
+    """
+    _episode_record plus the rendered description, the text stored by RenderedDescription.with_text
+    or rendered here if there is none. Only for rows of this database, its templates render them.
+    """
+    record = _episode_record(row)
+    record['rendered'] = row['rendered']
+    if record['rendered'] is None:
+        record['rendered'] = create_description_text(Folge(
+            row['title'], counter1=row['counter1'], counter2=row['counter2'], session=row['session'],
+            recording_date=row['record_date'], db_template=row['template']))
+    return record
+
+class TransferCancelled(Exception):
+    """Raised inside im- and exports when the cancelled callback says so"""
+
+EXPORT_FORMATS = {  # format name and the file suffix it is recognized by
+    'json': ".json",
+    'jsonl': ".jsonl",
+    'jsonl.gz': ".jsonl.gz",
+    'jsonl.xz': ".jsonl.xz",
+    'sqlite': ".sqlite",
+}
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+def format_of(file_path: Path | str) -> str:
+    """Guesses the export format by the file name, anything unknown is treated as plain json"""
+    name = Path(file_path).name.lower()
+    for fmt, suffix in sorted(EXPORT_FORMATS.items(), key=lambda x: -len(x[1])):  # longest suffix first
+        if name.endswith(suffix):
+            return fmt
+    if name.endswith(SQLITE_SUFFIXES):
+        return 'sqlite'
+    return 'json'
+
+def _open_for_writing(file_path: Path | str, fmt: str) -> TextIO:
+    if fmt == 'jsonl.gz':
+        return gzip.open(file_path, "wt", encoding="utf-8")
+    if fmt == 'jsonl.xz':
+        return lzma.open(file_path, "wt", encoding="utf-8")
+    return open(file_path, "w", encoding="utf-8")
+
+def _write_export(file_path: Path | str,
+                  sections: tuple,
+                  trailer: dict,
+                  compact: bool = False,
+                  progress: Callable[[int, int], None] | None = None,
+                  cancelled: Callable[[], bool] | None = None,
+                  fmt: str = 'json') -> bool:
+    """
+    Writes the export format record by record, the queries of the sections are read in chunks
+    so memory stays flat. The trailer values are written as plain top level keys after the sections.
+    The jsonl formats write one record per line and ignore compact, they are always compact.
+    """
+    total = sum(query.count() for _, query, _ in sections)
+    done = 0
+    lines = fmt != 'json'
+    if compact or lines:
+        indent, newline, separators = None, "", (',', ':')
+    else:
+        indent, newline, separators = 2, "\n", (',', ': ')
+    written = False  # * a file that could not even be opened is not ours to remove
+    try:
+        with _open_for_writing(file_path, fmt) as export_file:
+            written = True
+            if not lines:
+                export_file.write("{" + newline)
+            for name, query, to_record in sections:
+                if cancelled and cancelled():
+                    raise TransferCancelled()
+                if not lines:
+                    export_file.write(f'{"  " if not compact else ""}"{name}"{separators[1]}{{')
+                first = True
+                for row in query.dicts().iterator():
+                    if lines:
+                        export_file.write(json.dumps({'section': name, 'key': str(row["id"]),
+                                                      'record': to_record(row)}, separators=separators) + "\n")
+                    else:
+                        record = json.dumps(to_record(row), indent=indent, separators=separators)
+                        if not compact:
+                            record = record.replace("\n", "\n    ")  # nest into the section
+                        export_file.write(f'{"" if first else ","}{newline}{"    " if not compact else ""}'
+                                          f'"{row["id"]}"{separators[1]}{record}')
+                    first = False
+                    done += 1
+                    if done % EXPORT_CHUNK_SIZE == 0:
+                        if cancelled and cancelled():
+                            raise TransferCancelled()
+                        if progress:
+                            progress(done, total)
+                if not lines:
+                    export_file.write(f'{newline}{"  " if not compact and not first else ""}}},{newline}')
+            if lines:
+                for key, value in trailer.items():
+                    export_file.write(json.dumps({'section': key, 'value': value}, separators=separators) + "\n")
+            else:
+                trailer_lines = [f'{"  " if not compact else ""}"{key}"{separators[1]}'
+                                 f'{json.dumps(value, separators=separators if compact else None)}'
+                                 for key, value in trailer.items()]
+                export_file.write(f",{newline}".join(trailer_lines) + f"{newline}}}")
+    except TransferCancelled:
+        logging.info(f"Export to {file_path} cancelled")
+        Path(file_path).unlink(missing_ok=True)  # half a file is of no use to anyone
+        return False
+    except (OSError, TypeError, ValueError) as e:
+        logging.error(f"Exception: {e}")
+        if written:
+            Path(file_path).unlink(missing_ok=True)  # same as on cancel
+        return False
+    if progress:
+        progress(done, total)
+    logging.info(f"Exportet to {file_path}")
+    return True
+
+def export_to_json(file_path: Path | str = "export.json",
+                   compact: bool = False,
+                   progress: Callable[[int, int], None] | None = None,
+                   cancelled: Callable[[], bool] | None = None,
+                   fmt: str | None = None) -> bool:
     """
     Because only free data is happy is this the export button. It also makes it kinda easy to change the
     database scheme more without losing all data while doing so
 
+    The file is written record by record while the cursors are read in chunks, so memory stays flat
+    no matter how big the database is. The format is the same as it always was, episodes additionally
+    carry their rendered description as 'rendered', which the importers ignore. The change log is
+    pruned up to the '__sequence' of a successful export.
+
     :param file_path: path to the file to write to
+    :param compact: no indentation and whitespace, considerably smaller files
+    :param progress: called with (rows done, rows total) after every chunk
+    :param cancelled: checked after every chunk, if it returns True the export stops and the file is removed
+    :param fmt: one of EXPORT_FORMATS, guessed from the file name if not given
     :return: bool
     """
-    the_great_export = {}
-    # * select raw db objects, no need for DTOs
-    # * Projects
-    projects = {}  # ? maybe it would be better to create this as a list without index?
-    res = Project.select()
-    for each in res:
-        projects[each.id] = {
-            'uid': each.id,
-            'name': each.name,
-            'category': each.category,
-            'description': each.description,
-            'edit_date': each.edit_date.isoformat(),
-            'create_date': each.create_date.isoformat()
-        }
-    the_great_export['Projects'] = projects
-    # * %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-    # * Templates
-    templates = {}
-    res = TextTemplate.select()
-    for each in res:
-        each.edit_date = normalize_datetime(each.edit_date)
-        each.create_date = normalize_datetime(each.create_date)
-        templates[each.id] = {
-            'uid': each.id,
-            'title': each.title,
-            'pattern': each.pattern,
-            'tags': each.tags,
-            'edit_date': each.edit_date.isoformat(),
-            'create_date': each.create_date.isoformat()
-        }
-    the_great_export['Templates'] = templates
-    # * %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-    # * Episodes
-    episodes = {}
-    res = Episode.select()
-    for each in res:
-        try:
-            episodes[each.id] = {
-                'uid': each.id,
-                'edit_date': each.edit_date.isoformat(),
-                'create_date': each.create_date.isoformat(),
-                'title': each.title,
-                'counter1': each.counter1,
-                'counter2': each.counter2,
-                'record_date': each.record_date.isoformat(),
-                'session': each.session,
-                'description': each.description,
-                'notes': each.notes,
-                'template': each.template_id,
-                'project': each.project_id
-            }
-        except e:  # Yeah, yeah I know
-            logging.error(f"Exception: {e}")
-            return False
-    the_great_export['Episodes'] = episodes
-    # * %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+    fmt = fmt or format_of(file_path)
+    if fmt == 'sqlite':
+        return export_sqlite_snapshot(file_path, progress, cancelled)
+    sections = (
+        ('Projects', Project.select().order_by(Project.id), _project_record),
+        ('Templates', TextTemplate.select().order_by(TextTemplate.id), _template_record),
+        ('Episodes', RenderedDescription.with_text(Episode.select()).order_by(Episode.id), _exported_episode_record),
+    )
     # * No need for settings, this version (0.0.7) does not have any here
-    the_great_export['__version'] = "0.0.7"
-    with open(file_path, "w") as json_export_file:
-        json.dump(the_great_export, json_export_file, indent=2)
-    logging.info(f"Exportet to {file_path}")
+    # * the sequence tells a later export_since where this export left off
+    sequence = ChangeLog.current_sequence()
+    trailer = {'__version': EXPORT_VERSION, '__sequence': sequence}
+    if not _write_export(file_path, sections, trailer, compact, progress, cancelled, fmt):
+        return False
+    _prune_change_log(sequence)
     return True
 
-def import_from_json(file_path: Path | str) -> int:
-    with open(file_path, "r") as json_import:
+def _prune_change_log(until_seq: int) -> None:
+    """
+    After an export everything up to its '__sequence' is in a file, deltas continue from there and
+    the log does not grow forever. Deltas from an older export need a full export first.
+    """
+    if is_read_only() or not ChangeLog.table_exists():
+        return
+    try:
+        pruned = ChangeLog.prune(until_seq)
+    except PeeweeException as e:
+        logging.error(f"Pruning the change log failed, it is only bigger than it has to be: {e!r}")
+        return
+    logging.info(f"Pruned {pruned} entries up to {until_seq} from the change log")
+
+def _discard_snapshot(target: sqlite3.Connection | None, file_path: Path | str) -> None:
+    """Closes and removes an unfinished snapshot, whatever is left of it"""
+    if target:
+        target.close()
+    try:
+        Path(file_path).unlink(missing_ok=True)
+    except OSError as e:
+        logging.error(f"Could not remove unfinished snapshot {file_path}: {e!r}")
+
+def export_sqlite_snapshot(file_path: Path | str,
+                           progress: Callable[[int, int], None] | None = None,
+                           cancelled: Callable[[], bool] | None = None,
+                           pages: int = 256) -> bool:
+    """
+    Copies the entire database into a new file with the sqlite3 online backup API, the result is a
+    regular EpisodeNames database that can be opened directly or imported like any export
+
+    :param file_path: path of the snapshot, an existing file gets overwritten
+    :param progress: called with (pages done, pages total) after every step
+    :param cancelled: checked after every step, a cancelled snapshot is removed again
+    :param pages: pages copied per step
+    :return: bool
+    """
+    def step(status, remaining, total):
+        if cancelled and cancelled():
+            raise TransferCancelled()
+        if progress:
+            progress(total - remaining, total)
+
+    target = None
+    try:
+        target = sqlite3.connect(file_path)
+        database_proxy.connection().backup(target, pages=pages, progress=step)
+        # * the copy inherits WAL mode from the live database, as a file to pass around it should
+        # not leave -wal and -shm files next to it whenever it is opened
+        target.execute("PRAGMA journal_mode=DELETE")
+    except TransferCancelled:
+        logging.info(f"Snapshot to {file_path} cancelled")
+        _discard_snapshot(target, file_path)
+        return False
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Snapshot to {file_path} failed: {e!r}")
+        _discard_snapshot(target, file_path)  # * a half copied file must not look like a usable database
+        return False
+    target.close()
+    logging.info(f"Snapshot written to {file_path}")
+    return True
+
+class SqliteExportReader:
+    """
+    Reads another EpisodeNames database as if it were an export file, same interface as
+    JsonStreamReader, position and size count rows instead of characters
+    """
+    QUERIES = (
+        ('Projects', "SELECT * FROM project ORDER BY id", _project_record),
+        ('Templates', "SELECT * FROM texttemplate ORDER BY id", _template_record),
+        ('Episodes', "SELECT *, project_id AS project, template_id AS template FROM episode ORDER BY id",
+         _episode_record),
+    )
+
+    def __init__(self, db_path: Path | str):
+        self.connection = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+        self.connection.row_factory = sqlite3.Row
+        self.position = 0
+        self.size = sum(self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                        for table in ('project', 'texttemplate', 'episode'))
+
+    def sections(self) -> Iterator[tuple[str, str | None, object]]:
+        for section, query, to_record in self.QUERIES:
+            cursor = self.connection.execute(query)
+            while rows := cursor.fetchmany(EXPORT_CHUNK_SIZE):
+                for row in rows:
+                    self.position += 1
+                    data = dict(row)
+                    for date_field in ('edit_date', 'create_date'):  # raw sqlite has them as text
+                        data[date_field] = normalize_datetime(data[date_field])
+                    yield section, str(row['id']), to_record(data)
+
+    def close(self) -> None:
+        self.connection.close()
+
+@contextmanager
+def open_export(file_path: Path | str):
+    """
+    Opens any of the EXPORT_FORMATS for reading and yields a reader with sections(), position and size
+    """
+    fmt = format_of(file_path)
+    if fmt == 'sqlite':
+        reader = SqliteExportReader(file_path)
         try:
-            raw_data = json.load(json_import)
-        except JSONDecodeError as e:
-            logging.error(f"JSON import error: {e}")
-            return -1
-        # * check for proper json format
-        # * actually check for the export UIDs being correct to?
-        # ? maybe use json scheme for that? maybe overkill to see if 4 keys are present
-    count = 0
-    new_projects = {} # I could modify the raw_data, this is just a dictionary new & old id
-    for proj in raw_data['Projects'].values(): # ? in theory this could be empty ..but whats the point then
-        if not 'uid' in proj:
-            continue
-        new_id = Project.create_raw(
-            title=proj['name'],
-            category=proj.get('category', 'default'),
-            description=proj.get('description', ''),
-            edit_date=proj.get('edit_date', None),
-            create_date=proj.get('create_date', None)
-        )
-        new_projects[proj['uid']] = new_id
-        count+= 1
-    new_templates = {}
-    for tpl in raw_data['Templates'].values():
-        if not 'uid' in tpl:
-            continue # this seems like a pointless protection against nothing
-        new_id = TextTemplate.create_raw(
-            title=tpl['title'],
-            pattern=tpl.get('pattern', ''),
-            tags=tpl.get('tags', ''),
-            edit_date=tpl.get('edit_date', None),
-            create_date=tpl.get('create_date', None)
-        )
-        new_templates[tpl['uid']] = new_id
-        count+= 1
-    for epi in raw_data['Episodes'].values():
-        if not 'uid' in epi:
-            continue
-        res = Episode.create_raw(
-            title=epi['title'],
-            counter1=epi.get('counter1', 1),
-            counter2=epi.get('counter2', 0),
-            record_date=epi.get('record_date', date.today()),
-            session=epi.get('session', ''),
-            description=epi.get('description', ''),
-            notes=epi.get('notes', ''),
-            template_id=new_templates[epi['template']],
-            project_id=new_projects[epi['project']],
-            edit_date=epi.get('edit_date', None),
-            create_date=epi.get('create_date', None)
-        )
-        count+= 1
+            yield reader
+        finally:
+            reader.close()
+        return
+    size = Path(file_path).stat().st_size
+    if fmt == 'json':
+        with open(file_path, "r", encoding="utf-8") as json_file:
+            reader = JsonStreamReader(json_file)
+            reader.size = size
+            yield reader
+        return
+    with open(file_path, "rb") as raw:
+        if fmt == 'jsonl.gz':
+            text = io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding="utf-8")
+        elif fmt == 'jsonl.xz':
+            text = io.TextIOWrapper(lzma.LZMAFile(raw), encoding="utf-8")
+        else:
+            text = io.TextIOWrapper(raw, encoding="utf-8")
+        reader = JsonLinesReader(text, raw)
+        reader.size = size
+        yield reader
+
+def export_since(since_seq: int,
+                 file_path: Path | str = "export_delta.json",
+                 compact: bool = False,
+                 progress: Callable[[int, int], None] | None = None,
+                 cancelled: Callable[[], bool] | None = None) -> int | None:
+    """
+    Exports only what changed after the given sequence number of the change log, in the same
+    format as export_to_json. Rows that were deleted in the meantime are listed by id in an
+    additional 'Deleted' section, which the importers ignore.
+
+    :param since_seq: '__sequence' of the last export, 0 exports everything ever logged as long as nothing was pruned
+    :param file_path: path to the file to write to
+    :param compact: see export_to_json
+    :param progress: see export_to_json
+    :param cancelled: see export_to_json
+    :return: the sequence number to pass next time, None if the export failed or the change log
+             was already pruned past since_seq
+    """
+    if not ChangeLog.table_exists():  # * older database opened read-only, nothing was ever logged
+        logging.error(f"Delta export to {file_path} impossible, the database has no change log")
+        return None
+    if since_seq < ChangeLog.first_available():
+        logging.error(f"Delta export to {file_path} impossible, the change log was pruned after {since_seq}, "
+                      f"a full export is needed")
+        return None
+    until_seq = ChangeLog.current_sequence()  # rows changing while exporting will be in the next delta
+    changed_episodes = ChangeLog.changed_ids(Episode, since_seq, until_seq)
+    # * projects and templates of changed episodes come along, so the file can be merged on its own
+    referenced = {
+        'Projects': Episode.select(Episode.project).where(Episode.id.in_(changed_episodes)),
+        'Templates': Episode.select(Episode.template).where(Episode.id.in_(changed_episodes)),
+    }
+    sections = []
+    deleted = {}
+    for name, model, to_record in (('Projects', Project, _project_record),
+                                   ('Templates', TextTemplate, _template_record),
+                                   ('Episodes', Episode, _exported_episode_record)):
+        changed_ids = ChangeLog.changed_ids(model, since_seq, until_seq)
+        condition = model.id.in_(changed_ids)
+        if name in referenced:
+            condition = condition | model.id.in_(referenced[name])
+        query = model.select().where(condition).order_by(model.id)
+        if model is Episode:
+            query = RenderedDescription.with_text(query)
+        sections.append((name, query, to_record))
+        deleted[name] = [row_id for (row_id,) in (ChangeLog
+                                                   .select(ChangeLog.row_id).distinct()
+                                                   .where(ChangeLog.row_id.in_(changed_ids),
+                                                          ChangeLog.row_id.not_in(model.select(model.id)))
+                                                   .tuples())]
+    trailer = {
+        'Deleted': deleted,
+        '__version': EXPORT_VERSION,
+        '__since': since_seq,
+        '__sequence': until_seq
+    }
+    if not _write_export(file_path, tuple(sections), trailer, compact, progress, cancelled):
+        return None
+    _prune_change_log(until_seq)
+    return until_seq
+
+IMPORT_BATCH_SIZE = 500  # rows per insert_many, sqlite has a limit on bound variables per statement
+
+def _next_free_id(model) -> int:
+    res = model.select(fn.Max(model.id)).scalar()
+    return (res or 0) + 1
+
+def _project_row(proj: dict, new_id: int) -> dict:
+    return {
+        'id': new_id,
+        'name': proj['name'],
+        'category': proj.get('category', 'default'),
+        'description': proj.get('description', ''),
+        'edit_date': normalize_datetime(proj.get('edit_date', None)),
+        'create_date': normalize_datetime(proj.get('create_date', None))
+    }
+
+def _template_row(tpl: dict, new_id: int) -> dict:
+    return {
+        'id': new_id,
+        'title': tpl['title'],
+        'pattern': tpl.get('pattern', ''),
+        'tags': tpl.get('tags') or '',  # TODO null constraint
+        'edit_date': normalize_datetime(tpl.get('edit_date', None)),
+        'create_date': normalize_datetime(tpl.get('create_date', None))
+    }
+
+def _episode_row(epi: dict, new_projects: dict[int, int], new_templates: dict[int, int]) -> dict:
+    return {
+        'title': epi['title'],
+        'counter1': epi.get('counter1', 1),
+        'counter2': epi.get('counter2', 0),
+        'record_date': epi.get('record_date', date.today()),
+        'session': epi.get('session', ''),
+        'description': epi.get('description', ''),
+        'notes': epi.get('notes', ''),
+        'template': new_templates[epi['template']],
+        'project': new_projects[epi['project']],
+        'edit_date': normalize_datetime(epi.get('edit_date', None)),
+        'create_date': normalize_datetime(epi.get('create_date', None))
+    }
+
+def _insert_batched(model, rows: list[dict]) -> None:
+    for i in range(0, len(rows), IMPORT_BATCH_SIZE):
+        model.insert_many(rows[i:i + IMPORT_BATCH_SIZE]).execute()
+
+def import_from_json(file_path: Path | str,
+                     purge_first: bool = False,
+                     progress: Callable[[int, int], None] | None = None,
+                     cancelled: Callable[[], bool] | None = None) -> int:
+    """
+    Imports an export file as new data, all ids get new values after the ones already in the database.
+    Everything happens in one transaction with batched inserts, if anything fails nothing is imported.
+
+    The file is read incrementally, so only one batch of rows is held in memory at any time. This
+    relies on the section order of export_to_json, episodes must come after projects and templates.
+
+    :param file_path: path to an export made by export_to_json, in any of the EXPORT_FORMATS
+    :param purge_first: deletes all current data inside the same transaction, a failed import keeps the old data
+    :param progress: called with (characters read, file size) after every batch, the number of
+                     rows is not known before the file is read entirely
+    :param cancelled: checked after every batch, if it returns True everything is rolled back
+    :return: number of imported rows, -1 on error or cancel
+    """
+    if is_read_only():  # * bulk-import would lift query_only
+        logging.error(f"Import of {file_path} refused, the database is opened read-only")
+        return -1
+    previous_profile = get_db_profile()
+    set_db_profile('bulk-import')
+    try:
+        with open_export(file_path) as reader, database_proxy.atomic():
+            total = reader.size
+            if purge_first and not purge_all_user_data(True):
+                raise PeeweeException("purge before import failed")
+            # * ids are handed out here instead of by sqlite so the remapping can happen in memory
+            next_ids = {'Projects': _next_free_id(Project), 'Templates': _next_free_id(TextTemplate)}
+            new_ids = {'Projects': {}, 'Templates': {}}  # dictionary of old & new id per section
+            models = {'Projects': Project, 'Templates': TextTemplate, 'Episodes': Episode}
+            current, rows, count = None, [], 0
+            for section, key, record in reader.sections():
+                if section not in models or not isinstance(record, dict):
+                    continue  # __version and whatever else might come along
+                if section != current or len(rows) >= IMPORT_BATCH_SIZE:
+                    if current:
+                        _insert_batched(models[current], rows)
+                    if cancelled and cancelled():
+                        raise TransferCancelled()
+                    if progress:
+                        progress(min(reader.position, total), total)
+                    current, rows = section, []
+                if not 'uid' in record:
+                    continue  # this seems like a pointless protection against nothing
+                if section == 'Episodes':
+                    rows.append(_episode_row(record, new_ids['Projects'], new_ids['Templates']))
+                else:
+                    new_id = next_ids[section]
+                    new_ids[section][record['uid']] = new_id
+                    next_ids[section] += 1
+                    to_row = _project_row if section == 'Projects' else _template_row
+                    rows.append(to_row(record, new_id))
+                count += 1
+            if current:
+                _insert_batched(models[current], rows)
+            RenderedDescription.refresh_stale()  # * imported episodes come without stored texts
+            if cancelled and cancelled():  # last chance before the commit
+                raise TransferCancelled()
+    except TransferCancelled:
+        logging.info(f"Import of {file_path} cancelled, nothing was imported")
+        invalidate_compiled()  # a purge might have been rolled back
+        return -1
+    except JSONDecodeError as e:
+        logging.error(f"JSON import error, nothing was imported: {e}")
+        return -1
+    except (OSError, EOFError, KeyError, TypeError, ValueError, PeeweeException, sqlite3.Error, lzma.LZMAError) as e:
+        logging.error(f"JSON import failed, nothing was imported: {e!r}")
+        invalidate_compiled()
+        return -1
+    finally:
+        invalidate_project()  # whatever was cached, the import or its rollback made it worthless
+        set_db_profile(previous_profile)
+    if progress:
+        progress(total, total)
     return count
 
-    #delete old data
-    #create new data
-    #generate new ids
+MERGE_COMPARE = {  # content fields per model, edit and create date are not content
+    'Projects': ('name', 'category', 'description'),
+    'Templates': ('title', 'pattern', 'tags'),
+    'Episodes': ('title', 'counter1', 'counter2', 'record_date', 'session', 'description', 'notes', 'template'),
+}
+
+def _comparable(value):
+    """Dates become isoformat and empty strings None, so database and json values can be compared"""
+    value = _iso(value)
+    return value if value != "" else None
+
+def _merge_row(model, section: str, existing: dict, incoming: dict, counts: dict[str, int]) -> int:
+    """
+    Decides for one record that exists on both sides, the newer edit_date wins if the content differs
+
+    :return: database id of the existing row
+    """
+    fields = MERGE_COMPARE[section]
+    if all(_comparable(existing[f]) == _comparable(incoming[f]) for f in fields):
+        counts['unchanged'] += 1
+    elif normalize_datetime(existing['edit_date']) >= incoming['edit_date']:
+        counts['kept'] += 1  # ours is newer, theirs gets ignored
+    else:
+        changes = {f: incoming[f] for f in fields}
+        changes['edit_date'] = incoming['edit_date']
+        model.update(**changes).where(model.id == existing['id']).execute()
+        counts['updated'] += 1
+    return existing['id']
+
+def _merge_episode_batch(rows: list[dict], counts: dict[str, int]) -> None:
+    """Matches a batch of incoming episodes by (project, counter1, counter2) against the database"""
+    if not rows:
+        return
+    existing = {}
+    res = (Episode.select()
+           .where(Episode.project.in_({row['project'] for row in rows}),
+                  Episode.counter1.in_({row['counter1'] for row in rows}))
+           .dicts())
+    for each in res:
+        existing.setdefault((each['project'], each['counter1'], each['counter2']), each)
+    new_rows = []
+    for row in rows:
+        key = (row['project'], row['counter1'], row['counter2'])
+        if key in existing:
+            _merge_row(Episode, 'Episodes', existing[key], row, counts)
+        else:
+            new_rows.append(row)
+            existing[key] = {**row, 'id': None}  # duplicates inside the file are inserted only once
+    _insert_batched(Episode, new_rows)
+    counts['inserted'] += len(new_rows)
+
+def merge_from_json(file_path: Path | str,
+                    progress: Callable[[int, int], None] | None = None,
+                    cancelled: Callable[[], bool] | None = None) -> dict[str, int] | None:
+    """
+    Merges an export into the current data instead of appending it. Records are matched by their
+    natural keys: projects by name and category, templates by title and episodes by project,
+    counter1 and counter2. Matched records are only written if the content differs and the incoming
+    edit_date is newer, everything else gets inserted. Runs in one transaction like import_from_json.
+
+    :param file_path: path to an export made by export_to_json, in any of the EXPORT_FORMATS
+    :param progress: see import_from_json
+    :param cancelled: see import_from_json
+    :return: counts of 'inserted', 'updated', 'unchanged' and 'kept' (ours was newer), None on error or cancel
+    """
+    if is_read_only():  # * bulk-import would lift query_only
+        logging.error(f"Merge of {file_path} refused, the database is opened read-only")
+        return None
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'kept': 0}
+    previous_profile = get_db_profile()
+    set_db_profile('bulk-import')
+    total = 0
+    try:
+        with open_export(file_path) as reader, database_proxy.atomic():
+            total = reader.size
+            # * projects and templates are few, those are held entirely for matching
+            known = {
+                'Projects': {(p['name'], p['category']): p for p in Project.select().dicts()},
+                'Templates': {t['title']: t for t in TextTemplate.select().dicts()},
+            }
+            models = {'Projects': Project, 'Templates': TextTemplate}
+            next_ids = {'Projects': _next_free_id(Project), 'Templates': _next_free_id(TextTemplate)}
+            new_ids = {'Projects': {}, 'Templates': {}}
+            episodes = []
+            for section, key, record in reader.sections():
+                if not isinstance(record, dict) or not 'uid' in record:
+                    continue
+                if section == 'Episodes':
+                    episodes.append(_episode_row(record, new_ids['Projects'], new_ids['Templates']))
+                    if len(episodes) >= IMPORT_BATCH_SIZE:
+                        _merge_episode_batch(episodes, counts)
+                        episodes = []
+                        if cancelled and cancelled():
+                            raise TransferCancelled()
+                        if progress:
+                            progress(min(reader.position, total), total)
+                    continue
+                if section not in models:
+                    continue
+                to_row = _project_row if section == 'Projects' else _template_row
+                row = to_row(record, next_ids[section])
+                natural_key = (row['name'], row['category']) if section == 'Projects' else row['title']
+                if natural_key in known[section]:
+                    new_ids[section][record['uid']] = _merge_row(
+                        models[section], section, known[section][natural_key], row, counts)
+                    continue
+                models[section].insert(**row).execute()
+                known[section][natural_key] = row
+                new_ids[section][record['uid']] = row['id']
+                next_ids[section] += 1
+                counts['inserted'] += 1
+            _merge_episode_batch(episodes, counts)
+            RenderedDescription.refresh_stale()  # * new episodes and changed templates need their texts
+            if cancelled and cancelled():
+                raise TransferCancelled()
+    except TransferCancelled:
+        logging.info(f"Merge of {file_path} cancelled, nothing was changed")
+        return None
+    except JSONDecodeError as e:
+        logging.error(f"JSON merge error, nothing was changed: {e}")
+        return None
+    except (OSError, EOFError, KeyError, TypeError, ValueError, PeeweeException, sqlite3.Error, lzma.LZMAError) as e:
+        logging.error(f"JSON merge failed, nothing was changed: {e!r}")
+        return None
+    finally:
+        invalidate_compiled()  # templates might have changed underneath
+        invalidate_project()
+        set_db_profile(previous_profile)
+    if progress:
+        progress(total, total)
+    return counts
 
 def purge_all_user_data(sure=False) -> bool:
     """
-    Deletes all content that is not settings
+    Deletes all content that is not settings, in a single transaction so that either everything
+    or nothing is gone. Inside another transaction (the import) this becomes a savepoint.
     :param bool sure: if you are not sure, nothing happens
     :return: bool
     """
     if not sure: # this is silly, i know
         return False
-    Project.delete().execute()
-    Episode.delete().execute()
-    TextTemplate.delete().execute()
-    return True
\ No newline at end of file
+    try:
+        with database_proxy.atomic():
+            # * episodes first, they reference the other two
+            RenderedDescription.delete().execute()
+            Episode.delete().execute()
+            Project.delete().execute()
+            TextTemplate.delete().execute()
+    except PeeweeException as e:
+        logging.error(f"Purge failed, nothing was deleted: {e!r}")
+        return False
+    invalidate_compiled()  # ids might be reused by the next import
+    invalidate_project()
+    return True
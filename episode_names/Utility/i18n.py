@@ -75,6 +75,7 @@ i18n = LanguageArchive({
     'New Entry created': "New Entry Created",
     'Edit Episode': "episode: Edit Episode '%%E%%'",
     'Edit Episode Helper': "Opens a menu to edit episode '%%E%%' of project %%P%%",
+    'Found Episode': "episode: #%%C%% '%%E%%'",
     'Create Project': "Project:C",
     'Edit Project': "project: Edit Project '%%P%%'",
     'Edit Project Helper': "Opens a menu to edit project '%%P%%' (ID: %%DB%%)",
@@ -127,7 +128,22 @@ i18n = LanguageArchive({
     'app: Quit episode_names': "app: Quit episode_names",
     'warning_delete_current_data': "Importing a new set of data will delete all current data including settings",
     'Data has changed, you really want to abort?': "Data has changed, you really want to abort?",
-    'Quit episode_names and return to the command line': 'Quit episode_names and return to the command line'
+    'Quit episode_names and return to the command line': 'Quit episode_names and return to the command line',
+    'Compact export': "Compact export (no indentation)",
+    'Export cancelled': "Export cancelled, no file was written",
+    'Import cancelled': "Import cancelled, nothing was changed",
+    'Import failed': "Import failed, nothing was changed",
+    'Export format json': "JSON",
+    'Export format jsonl': "JSON Lines",
+    'Export format jsonl.gz': "JSON Lines, gzip compressed",
+    'Export format jsonl.xz': "JSON Lines, xz compressed",
+    'Export format sqlite': "SQLite snapshot",
+    'Merge into current data': "Merge into current data (update instead of append)",
+    'Database maintenance': "Database maintenance (check, optimize & compact)",
+    'Delete all data': "Delete all projects, templates and episodes",
+    'Backup failed, nothing was purged': "Backup failed, nothing was purged",
+    'warning_purge_all_data': "This deletes all projects, templates and episodes. Settings are kept. Continue?",
+    'Merge result': "Merged: %%I%% new, %%U%% updated, %%S%% unchanged, %%K%% kept (ours newer)",
 }) # Cheap Trick to make sure there is always something
 
 # i18n['']
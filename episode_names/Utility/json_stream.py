@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2025 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Incremental reader for the export format, which is one object of sections that are
+again objects of records:
+
+{"Projects": {"1": {...}, "2": {...}}, "Templates": {...}, "Episodes": {...}, "__version": "0.0.7"}
+
+Only one record at a time is decoded, the rest of the file stays on disk. Only the two outer
+levels are walked by hand, every record itself is handed to json.JSONDecoder.raw_decode.
+
+The JSON Lines variant of the format has one record per line instead:
+
+{"section": "Projects", "key": "1", "record": {...}}
+{"section": "__version", "value": "0.0.7"}
+"""
+import json
+from typing import Iterator, TextIO, BinaryIO
+
+WHITESPACE = " \t\n\r"
+
+class JsonStreamReader:
+    def __init__(self, file: TextIO, chunk_size: int = 64 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.read_total = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Reads the next chunk, drops everything before the current position. False at end of file"""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.read_total += len(chunk)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    @property
+    def position(self) -> int:
+        """Number of characters of the file that are already consumed"""
+        return self.read_total - (len(self.buffer) - self.pos)
+
+    def _peek(self) -> str:
+        """Next character that is not whitespace, without consuming it, empty string at the end"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        found = self._peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def _value(self):
+        """Decodes the next complete value, reads more of the file until it fits into the buffer"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:  # a number at the very end might be cut off
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._fill():
+                continue  # eof is set now, one last try that raises or returns
+
+    def _members(self) -> Iterator[str]:
+        """Walks the keys of an object, the caller has to consume the value after each key"""
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting property name", self.buffer, self.pos)
+            self._expect(":")
+            yield key
+            if self._peek() == ",":
+                self.pos += 1
+                continue
+            self._expect("}")
+            return
+
+    def sections(self) -> Iterator[tuple[str, str | None, object]]:
+        """
+        Yields (section, key, record) for every record of the object sections and
+        (name, None, value) for everything on the top level that is not an object
+        """
+        for section in self._members():
+            if self._peek() != "{":
+                yield section, None, self._value()
+                continue
+            for key in self._members():
+                yield section, key, self._value()
+
+
+class JsonLinesReader:
+    """
+    Same interface as JsonStreamReader for the line based format, the file may be a decompressing
+    wrapper, in that case raw is the compressed file underneath and position counts its bytes
+    """
+    def __init__(self, file: TextIO, raw: BinaryIO | None = None):
+        self.file = file
+        self.raw = raw
+        self.read_total = 0
+
+    @property
+    def position(self) -> int:
+        if self.raw is not None:
+            return self.raw.tell()
+        return self.read_total
+
+    def sections(self) -> Iterator[tuple[str, str | None, object]]:
+        for line in self.file:
+            self.read_total += len(line)
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'record' in entry:
+                yield entry['section'], entry.get('key'), entry['record']
+            else:
+                yield entry['section'], None, entry.get('value')
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2025 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Housekeeping for the database file. Years of edits and repeated imports leave free pages all over
+the file and outdated statistics for the query planner, this puts both back in order.
+
+Every task returns a MaintenanceResult with its duration and the size of the file before and
+after, run_maintenance() chains several of them.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from peewee import PeeweeException
+
+from episode_names.Utility.db import database_proxy, RenderedDescription
+from episode_names.Utility.db_aux_utility import purge_all_user_data
+
+@dataclass(slots=True)
+class MaintenanceResult:
+    task: str
+    ok: bool
+    seconds: float
+    bytes_before: int
+    bytes_after: int
+    message: str = ""
+
+    @property
+    def reclaimed(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self):
+        text = f"{self.task}: {'ok' if self.ok else 'FAILED'} in {self.seconds:.2f}s"
+        if self.reclaimed > 0:
+            text += f", reclaimed {self.reclaimed / 1024:.0f} KiB"
+        if self.message:
+            text += f" - {self.message}"
+        return text
+
+def database_size() -> int:
+    """Size of the database in bytes as sqlite sees it, the WAL file is not included"""
+    return database_proxy.pragma("page_count") * database_proxy.pragma("page_size")
+
+def _checkpoint() -> None:
+    """Writes the WAL back into the main file and truncates it, otherwise the WAL keeps all the bytes"""
+    if str(database_proxy.pragma("journal_mode")).lower() == "wal":
+        database_proxy.execute_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def quick_check() -> str:
+    """
+    PRAGMA quick_check, the cheap variant of integrity_check that skips verifying index contents
+
+    :return: empty string if the file is fine, otherwise the problems sqlite found
+    """
+    lines = [row[0] for row in database_proxy.execute_sql("PRAGMA quick_check").fetchall()]
+    return "" if lines == ["ok"] else "; ".join(lines)
+
+def vacuum() -> str:
+    """Rebuilds the file without free pages and half empty ones, must not run inside a transaction"""
+    database_proxy.execute_sql("VACUUM")
+    _checkpoint()
+    return ""
+
+def optimize() -> str:
+    """PRAGMA optimize, only analyzes tables whose statistics sqlite considers outdated"""
+    database_proxy.execute_sql("PRAGMA optimize")
+    return ""
+
+def analyze() -> str:
+    """Full ANALYZE of every table and index, slower than optimize but always up to date"""
+    database_proxy.execute_sql("ANALYZE")
+    return ""
+
+def render() -> str:
+    """Renders the descriptions of all episodes whose stored text is missing or outdated, after imports"""
+    return f"{RenderedDescription.refresh_stale()} descriptions rendered"
+
+def purge() -> str:
+    """Deletes all projects, templates and episodes in one transaction"""
+    if not purge_all_user_data(True):
+        raise PeeweeException("purge was rolled back")
+    return ""
+
+MAINTENANCE_TASKS: dict[str, Callable[[], str]] = {
+    'quick_check': quick_check,
+    'optimize': optimize,
+    'analyze': analyze,
+    'render': render,
+    'vacuum': vacuum,
+    'purge': purge,
+}
+DEFAULT_MAINTENANCE = ('quick_check', 'render', 'optimize', 'vacuum')  # purge has to be asked for explicitly
+DESTRUCTIVE_MAINTENANCE = frozenset({'purge', 'vacuum'})  # a snapshot is taken before these run
+
+def run_task(name: str) -> MaintenanceResult:
+    """
+    Runs a single task of MAINTENANCE_TASKS and measures it
+
+    :param name: key of MAINTENANCE_TASKS
+    :return: MaintenanceResult, ok is False if the task failed or found a problem
+    """
+    if name not in MAINTENANCE_TASKS:
+        return MaintenanceResult(name, False, 0.0, 0, 0, "unknown task")
+    before = database_size()
+    start = time.perf_counter()
+    ok, message = True, ""
+    try:
+        message = MAINTENANCE_TASKS[name]()
+        if name == 'quick_check' and message:
+            ok = False
+    except PeeweeException as e:
+        logging.error(f"Maintenance task {name} failed: {e!r}")
+        ok, message = False, str(e)
+    result = MaintenanceResult(name, ok, time.perf_counter() - start, before, database_size(), message)
+    logging.info(f"Maintenance {result}")
+    return result
+
+def run_maintenance(tasks: Iterable[str] = DEFAULT_MAINTENANCE,
+                    progress: Callable[[int, int], None] | None = None) -> list[MaintenanceResult]:
+    """
+    Runs several tasks one after another, stops after a failed quick_check as rebuilding or
+    analyzing a damaged file only makes things worse
+
+    :param tasks: names of MAINTENANCE_TASKS, in the order they should run
+    :param progress: called with (tasks done, tasks total) after every task
+    :return: one result per task that ran
+    """
+    tasks = list(tasks)
+    results = []
+    for i, name in enumerate(tasks):
+        results.append(run_task(name))
+        if progress:
+            progress(i + 1, len(tasks))
+        if name == 'quick_check' and not results[-1].ok:
+            break
+    return results
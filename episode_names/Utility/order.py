@@ -22,13 +22,18 @@
 
 import copy
 import os
-import re
 import json
 
 from pathlib import Path
+from itertools import batched
+from typing import Iterable, Iterator
 from platformdirs import user_data_dir
 from datetime import date
-from episode_names.Utility.db import init_db, Project, Playlist, Episode, Folge, TextTemplate, PatternTemplate
+from episode_names.Utility.db import (init_db, database_proxy, DEFAULT_DB_PROFILE, Project, Playlist, Episode, Folge,
+                                      TextTemplate, PatternTemplate, RenderedDescription)
+from episode_names.Utility.templating import CompiledTemplate, get_compiled, compile_template, compiled_generation
+from episode_names.Utility.backup import BackupSettings, start_backups
+from episode_names.Utility.project_cache import project_cache
 
 def new_episode(previous: Folge,
                 new_session=None,
@@ -115,36 +120,92 @@ Aufnahme vom $$record_date$$ - #$$counter1$$ - ##$$counter2$$"""
     Project.create_new(Playlist("Dragon Age Origins", "disgrace"))
     print("Done with my dastardly task master")
 
-def create_description_text(this: Folge) -> str or None:
+def get_template(template_id: int) -> CompiledTemplate | None:
+    """
+    The compiled version of a template, it is only loaded from the database the first time
+    or after it got changed
+
+    :param template_id: DB UID of the template, 0 for none
+    :return: the compiled template or None if it does not exist
     """
+    if not template_id:
+        return None
+    compiled = get_compiled(template_id)
+    if not compiled:
+        generation = compiled_generation()
+        text = TextTemplate.as_PTemplate_by_uid(template_id)
+        if not text:
+            return None
+        compiled = compile_template(text, generation)
+    return compiled
 
-    TODO: make this more efficient.
+def create_description_text(this: Folge) -> str or None:
+    """
+    Renders the description of an episode with its assigned template, the template is
+    only loaded from the database the first time or after it got changed
 
     :param this:
-    :return:
+    :return: the finished text or None if there is no template
     """
-    def multisub(subs, subject):
-        "Simultaneously perform all substitutions on the subject string."
-        # https://stackoverflow.com/a/765835
-        pattern = '|'.join('(%s)' % re.escape(p) for p, s in subs)
-        substs = [s for p, s in subs]
-        replace = lambda m: substs[m.lastindex - 1]
-        return re.sub(pattern, replace, subject)
+    compiled = get_template(this.db_template)
+    if not compiled:
+        return None # If no template is assigned
+    return compiled.render(this)
 
-    if not this.db_template:
-        return None
+def compile_templates(template_ids: Iterable[int]) -> None:
+    """
+    Makes sure all given templates are compiled, the ones that are not get loaded in a single query
+    """
+    missing = [t_id for t_id in set(template_ids) if t_id and not get_compiled(t_id)]
+    generation = compiled_generation()
+    for each in TextTemplate.by_uids(missing):
+        compile_template(each, generation)
 
-    text = TextTemplate.as_PTemplate_by_uid(this.db_template)
-    if not text:
-        return None # If no template is assigned
+def iter_render(episodes: Iterable[Folge]) -> Iterator[tuple[Folge, str | None]]:
+    """
+    Lazily renders episodes one after another, each template is loaded at most once,
+    so this can stream a project of any size into a file without holding it all
+
+    :param episodes: any iterable, also generators like Episode.iter_by_project
+    :return: generator of (episode, text) with text None if the template does not exist
+    """
+    for each in episodes:
+        if not each.db_template:
+            yield each, None
+            continue
+        compiled = get_compiled(each.db_template)
+        if not compiled:
+            compile_templates([each.db_template])
+            compiled = get_compiled(each.db_template)
+        yield each, compiled.render(each) if compiled else None
+
+def iter_descriptions(episodes: Iterable[Folge]) -> Iterator[tuple[Folge, str | None]]:
+    """
+    Same as iter_render, but the texts are read from RenderedDescription one chunk at a time,
+    only episodes without an up to date row there get rendered
 
-    return multisub([
-        ("$$counter1$$", str(this.counter1)),
-        ("$$counter2$$", str(this.counter2)),
-        ("$$session$$", this.session),
-        ("$$record_date$$", this.recording_date.strftime("%d.%m.%Y")), # TODO: make this setting
-        ("$$title$$", this.title)
-        ], text.pattern)
+    :param episodes: any iterable, also generators like Episode.iter_by_project
+    :return: generator of (episode, text) with text None if the template does not exist
+    """
+    for chunk in batched(episodes, RenderedDescription.CHUNK):
+        stored = RenderedDescription.by_episodes(each.db_uid for each in chunk)
+        missing = iter_render(each for each in chunk if each.db_uid not in stored)
+        for each in chunk:
+            if each.db_uid in stored:
+                yield each, stored[each.db_uid]
+            else:
+                yield next(missing)
+
+def render_many(episodes: list[Folge]) -> list[str | None]:
+    """
+    Renders the descriptions of a list of episodes, all templates involved are loaded in
+    one go beforehand instead of one query per episode
+
+    :param episodes: list of episodes, usually an entire project
+    :return: the texts in the same order, None where no template is assigned
+    """
+    compile_templates(each.db_template for each in episodes)
+    return [text for _, text in iter_render(episodes)]
 
 def user_setup(name, author, version) -> None:
     """
@@ -167,7 +228,13 @@ def user_setup(name, author, version) -> None:
                 default_conf_dict = {
                     'db_path': 'episode_names.db',
                     'relative_user_folder': True,
-                    'absolute_db_path': ""
+                    'absolute_db_path': "",
+                    'db_profile': "interactive",  # interactive, bulk-import or read-only
+                    'backup_on_start': True,
+                    'backup_on_exit': True,
+                    'backup_every_edits': 50,  # 0 to only backup at start and exit
+                    'backup_keep': 5,
+                    'project_cache_mb': 16  # memory for the episode lists of recently opened projects
                 }
                 json.dump(default_conf_dict, config_file, indent=2)
                 config = default_conf_dict
@@ -185,11 +252,19 @@ def user_setup(name, author, version) -> None:
         db_path = Path(user_dir) / config['db_path']
     else:
         db_path = Path(config['absolute_db_path'])
+    db_profile = config.get('db_profile', "interactive")  # older configs do not know this key
+    project_cache.resize(int(config.get('project_cache_mb', 16) * 1024 * 1024))
     if db_path.is_file():
-        init_db(db_path)
+        init_db(db_path, db_profile)
     else: # create new db file and drop dummy data into it
-        init_db(db_path)
+        init_db(db_path)  # * writable, a read-only profile could neither create the tables nor the dummy data
         create_dummy_data()
+        if db_profile != DEFAULT_DB_PROFILE:  # * opened again so the connections of all threads get the profile
+            database_proxy.close()
+            init_db(db_path, db_profile)
+    if db_profile != "read-only":
+        # snapshots land next to the database as <name>.backup-<timestamp>.db
+        start_backups(db_path, BackupSettings.from_config(config))
 
 if __name__ == "__main__":
     init_db()
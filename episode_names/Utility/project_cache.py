@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2025 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Keeps the loaded data of the last used projects around so switching back and forth between
+the same few projects does not hit the database every time. Least recently used projects get
+dropped once the estimated size of all entries exceeds the budget.
+
+Like the template cache this module does not know the database, the db layer calls
+invalidate_project whenever it writes episodes of a project. Entries are filled from worker
+threads, so everything goes through a lock and every project carries a generation: data that
+was read before an invalidation never makes it into the cache afterwards.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from episode_names.Utility.db import Folge
+
+DEFAULT_CACHE_BUDGET = 16 * 1024 * 1024  # bytes
+_FOLGE_OVERHEAD = 400  # rough size of a Folge with its ints, dates and the object itself
+
+def estimate_size(episodes: Iterable['Folge'], *texts: str) -> int:
+    """Rough memory footprint of a list of episodes and some additional text, good enough for a budget"""
+    size = sum(len(each) for each in texts)
+    for each in episodes:
+        size += (_FOLGE_OVERHEAD + len(each.title) + len(each.session) + len(each.description)
+                 + len(each.notes or "") + len(each.joined_template_title or ""))
+    return size
+
+class ProjectCache:
+    def __init__(self, budget: int = DEFAULT_CACHE_BUDGET):
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[Any, int]] = OrderedDict()  # project id: (value, size)
+        self._generations: dict[int, int] = {}
+        self._epoch = 0  # * goes up when everything is invalidated at once
+        self._lock = threading.Lock()
+
+    def generation(self, project_id: int) -> tuple[int, int]:
+        """Read this before loading a project from the database and hand it to put() afterwards"""
+        with self._lock:
+            return self._epoch, self._generations.get(project_id, 0)
+
+    def get(self, project_id: int) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(project_id)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, project_id: int) -> bool:
+        with self._lock:
+            return project_id in self._entries
+
+    def put(self, project_id: int, value: Any, size: int, generation: tuple[int, int]) -> bool:
+        """
+        Stores the data of a project and drops the least recently used ones until the budget fits
+
+        :param generation: what generation() returned before the data was read
+        :return: False if the project changed in the meantime or the entry alone exceeds the budget
+        """
+        if size > self.budget:
+            return False
+        with self._lock:
+            if (self._epoch, self._generations.get(project_id, 0)) != generation:
+                return False
+            self._drop(project_id)
+            self._entries[project_id] = (value, size)
+            self.used += size
+            while self.used > self.budget:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+            return True
+
+    def _drop(self, project_id: int) -> None:
+        entry = self._entries.pop(project_id, None)
+        if entry:
+            self.used -= entry[1]
+
+    def invalidate(self, project_id: int | None = None) -> None:
+        """Drops one project, or everything without an id, loads that are still running get discarded too"""
+        with self._lock:
+            if project_id is None:
+                self._epoch += 1
+                self._entries.clear()
+                self.used = 0
+            else:
+                self._generations[project_id] = self._generations.get(project_id, 0) + 1
+                self._drop(project_id)
+
+    def resize(self, budget: int) -> None:
+        with self._lock:
+            self.budget = budget
+            while self.used > self.budget and self._entries:
+                self._drop(next(iter(self._entries)))
+
+project_cache = ProjectCache()
+
+def invalidate_project(project_id: int | None = None) -> None:
+    """Called by the db layer whenever episodes of a project are written, without an id everything goes"""
+    project_cache.invalidate(project_id)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2025 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Syncs the current database with another EpisodeNames database file or an export file.
+
+Ids are meaningless between two machines, so every row is identified by its natural key
+(projects by name and category, templates by title, episodes by project, counter1 and counter2)
+and compared by a hash of its content. Only rows whose hash differs are looked at, the newer
+edit_date decides which side wins. Rows that only exist locally are left alone, without a common
+ancestor there is no telling a deletion on the other side from a new row on this side.
+"""
+import hashlib
+import json
+import logging
+import lzma
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from peewee import PeeweeException
+
+from episode_names.Utility.db import (
+    Episode, Project, TextTemplate, RenderedDescription, database_proxy, normalize_datetime, get_db_profile,
+    set_db_profile, is_read_only
+)
+from episode_names.Utility.db_aux_utility import open_export, format_of
+from episode_names.Utility.templating import invalidate_compiled
+from episode_names.Utility.project_cache import invalidate_project
+
+SYNC_BATCH_SIZE = 500
+
+@dataclass(slots=True)
+class SyncRow:
+    digest: bytes
+    edit_date: datetime | None
+    content: tuple
+    create_date: datetime | None = None
+    db_uid: int | None = None  # only known on the local side
+
+@dataclass(slots=True)
+class SyncReport:
+    added: int = 0
+    updated: int = 0
+    conflicting: int = 0  # both differ and ours is newer, ours was kept
+    unchanged: int = 0
+    conflicts: list[tuple[str, tuple]] = field(default_factory=list)
+
+    def __str__(self):
+        return (f"{self.added} added, {self.updated} updated, "
+                f"{self.conflicting} conflicting, {self.unchanged} unchanged")
+
+# * content columns in the order they get hashed, episodes refer to project and template by natural key
+PROJECT_CONTENT = ('name', 'category', 'description')
+TEMPLATE_CONTENT = ('title', 'pattern', 'tags')
+EPISODE_CONTENT = ('title', 'record_date', 'session', 'description', 'notes', 'template')
+
+Snapshot = dict[str, dict[tuple | str, SyncRow]]
+
+def _digest(content: tuple) -> bytes:
+    return hashlib.blake2b(json.dumps(content, default=str).encode(), digest_size=16).digest()
+
+def _text(value) -> str | None:
+    """Same spelling for values coming from sqlite and from json, empty strings count as nothing"""
+    if value is None or value == "":
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+def _date(value) -> datetime | None:
+    try:
+        return normalize_datetime(value) if value else None
+    except ValueError:
+        return None
+
+def _add(snapshot: Snapshot, section: str, key, content: tuple, edit_date, create_date, db_uid=None) -> None:
+    snapshot[section].setdefault(key, SyncRow(_digest(content), _date(edit_date), content, _date(create_date), db_uid))
+
+def snapshot_from_connection(execute: Callable[[str], sqlite3.Cursor]) -> Snapshot:
+    """
+    Reads all user data with plain SQL, works for the peewee connection as well as a sqlite3 one
+
+    :param execute: function that runs a query and returns a cursor
+    """
+    snapshot = {'Projects': {}, 'Templates': {}, 'Episodes': {}}
+    projects, templates = {}, {}
+    for uid, name, category, description, edit_date, create_date in execute(
+            "SELECT id, name, category, description, edit_date, create_date FROM project"):
+        projects[uid] = (name, category)
+        _add(snapshot, 'Projects', (name, category),
+             (name, category, _text(description)), edit_date, create_date, uid)
+    for uid, title, pattern, tags, edit_date, create_date in execute(
+            "SELECT id, title, pattern, tags, edit_date, create_date FROM texttemplate"):
+        templates[uid] = title
+        _add(snapshot, 'Templates', title, (title, _text(pattern), _text(tags)), edit_date, create_date, uid)
+    for row in execute("SELECT id, project_id, counter1, counter2, title, record_date, session, description, "
+                       "notes, template_id, edit_date, create_date FROM episode"):
+        uid, project_id, counter1, counter2, title, record_date, session, description, notes, template_id = row[:10]
+        if project_id not in projects:
+            continue  # orphan, nothing to attach it to on the other side
+        key = (projects[project_id], counter1, counter2 or 0)
+        content = (title, _text(record_date), _text(session), _text(description), _text(notes),
+                   templates.get(template_id))
+        _add(snapshot, 'Episodes', key, content, row[10], row[11], uid)
+    return snapshot
+
+def snapshot_from_sqlite(db_path: Path | str) -> Snapshot:
+    """Snapshot of another EpisodeNames database file, opened read only"""
+    connection = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    try:
+        return snapshot_from_connection(connection.execute)
+    finally:
+        connection.close()
+
+def snapshot_from_export(file_path: Path | str) -> Snapshot:
+    """Snapshot of an export file made by export_to_json or export_since, in any of the text formats"""
+    snapshot = {'Projects': {}, 'Templates': {}, 'Episodes': {}}
+    projects, templates = {}, {}
+    with open_export(file_path) as reader:
+        for section, key, record in reader.sections():
+            if not isinstance(record, dict) or 'uid' not in record:
+                continue
+            if section == 'Projects':
+                natural = (record['name'], record.get('category', 'default'))
+                projects[record['uid']] = natural
+                _add(snapshot, section, natural, (*natural, _text(record.get('description'))),
+                     record.get('edit_date'), record.get('create_date'))
+            elif section == 'Templates':
+                templates[record['uid']] = record['title']
+                _add(snapshot, section, record['title'],
+                     (record['title'], _text(record.get('pattern')), _text(record.get('tags'))),
+                     record.get('edit_date'), record.get('create_date'))
+            elif section == 'Episodes' and record.get('project') in projects:
+                natural = (projects[record['project']], record.get('counter1', 1), record.get('counter2') or 0)
+                content = (record['title'], _text(record.get('record_date')), _text(record.get('session')),
+                           _text(record.get('description')), _text(record.get('notes')),
+                           templates.get(record.get('template')))
+                _add(snapshot, section, natural, content, record.get('edit_date'), record.get('create_date'))
+    return snapshot
+
+def diff_snapshots(local: Snapshot, remote: Snapshot, report: SyncReport) -> dict[str, dict[str, list]]:
+    """
+    Compares both sides key by key, only rows with a different hash are looked at closer
+
+    :return: per section the keys to 'add' and to 'update'
+    """
+    changes = {}
+    for section in ('Projects', 'Templates', 'Episodes'):
+        changes[section] = {'add': [], 'update': []}
+        ours = local[section]
+        for key, theirs in remote[section].items():
+            mine = ours.get(key)
+            if mine is None:
+                changes[section]['add'].append(key)
+                report.added += 1
+            elif mine.digest == theirs.digest:
+                report.unchanged += 1
+            elif theirs.edit_date and (not mine.edit_date or theirs.edit_date > mine.edit_date):
+                changes[section]['update'].append(key)
+                report.updated += 1
+            else:
+                report.conflicting += 1
+                report.conflicts.append((section, key))
+    return changes
+
+def _apply(local: Snapshot, remote: Snapshot, changes: dict[str, dict[str, list]]) -> None:
+    """Writes the computed changes into the current database, expects to run inside a transaction"""
+    ids = {'Projects': {}, 'Templates': {}}
+    for section, model in (('Projects', Project), ('Templates', TextTemplate)):
+        ids[section] = {key: row.db_uid for key, row in local[section].items()}
+        fields = PROJECT_CONTENT if section == 'Projects' else TEMPLATE_CONTENT
+        for key in changes[section]['add']:
+            row = remote[section][key]
+            values = dict(zip(fields, row.content))
+            if section == 'Templates':
+                values['tags'] = values['tags'] or ''  # TODO null constraint
+                values['pattern'] = values['pattern'] or ''
+            else:
+                values['description'] = values['description'] or ''
+            ids[section][key] = model.insert(**values, edit_date=row.edit_date or datetime.now(),
+                                             create_date=row.create_date or datetime.now()).execute()
+        for key in changes[section]['update']:
+            row = remote[section][key]
+            values = {f: v or '' for f, v in zip(fields, row.content)}
+            model.update(**values, edit_date=row.edit_date).where(model.id == local[section][key].db_uid).execute()
+
+    def episode_values(key, row: SyncRow) -> dict:
+        title, record_date, session, description, notes, template = row.content
+        return {
+            'title': title,
+            'record_date': record_date,
+            'session': session or '',
+            'description': description or '',
+            'notes': notes,
+            'template': ids['Templates'].get(template, 0),  # unknown templates fall back to the default one
+            'edit_date': row.edit_date or datetime.now(),
+        }
+
+    new_rows = []
+    for key in changes['Episodes']['add']:
+        row = remote['Episodes'][key]
+        project_key, counter1, counter2 = key
+        new_rows.append({**episode_values(key, row), 'project': ids['Projects'][project_key],
+                         'counter1': counter1, 'counter2': counter2,
+                         'create_date': row.create_date or datetime.now()})
+        if len(new_rows) >= SYNC_BATCH_SIZE:
+            Episode.insert_many(new_rows).execute()
+            new_rows = []
+    if new_rows:
+        Episode.insert_many(new_rows).execute()
+    for key in changes['Episodes']['update']:
+        (Episode.update(**episode_values(key, remote['Episodes'][key]))
+         .where(Episode.id == local['Episodes'][key].db_uid)
+         .execute())
+
+def sync_from(source: Path | str, dry_run: bool = False) -> SyncReport | None:
+    """
+    Brings everything that is new or newer in source into the current database, in one transaction.
+
+    :param source: another EpisodeNames database file or an export file in any of the EXPORT_FORMATS
+    :param dry_run: only compute the report, change nothing
+    :return: the report, None if the source could not be read or the changes not be applied
+    """
+    report = SyncReport()
+    try:
+        if format_of(source) == 'sqlite':
+            remote = snapshot_from_sqlite(source)
+        else:
+            remote = snapshot_from_export(source)
+    except (OSError, EOFError, ValueError, KeyError, sqlite3.Error, lzma.LZMAError) as e:
+        logging.error(f"Cannot read sync source {source}: {e!r}")
+        return None
+    local = snapshot_from_connection(database_proxy.execute_sql)
+    changes = diff_snapshots(local, remote, report)
+    if dry_run:
+        return report
+    if is_read_only():  # * bulk-import would lift query_only
+        logging.error(f"Sync from {source} refused, the database is opened read-only")
+        return None
+    previous_profile = get_db_profile()
+    set_db_profile('bulk-import')
+    try:
+        with database_proxy.atomic():
+            _apply(local, remote, changes)
+            RenderedDescription.refresh_stale()  # * synced episodes come without stored texts
+    except (PeeweeException, KeyError, ValueError) as e:
+        logging.error(f"Sync from {source} failed, nothing was changed: {e!r}")
+        return None
+    finally:
+        invalidate_compiled()
+        invalidate_project()
+        set_db_profile(previous_profile)
+    logging.info(f"Synced from {source}: {report}")
+    return report
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2025 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Turns the $$token$$ patterns of templates into something that can be rendered without
+any regex work. A pattern gets split once into literals and tokens, rendering an episode
+is then only a list join. This module does not know the database, the db layer tells it
+when a template changed via invalidate_compiled.
+Templates get compiled from worker threads as well, so like the project cache every
+invalidation bumps a generation and a template read before it is not cached anymore.
+"""
+import re
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from episode_names.Utility.db import Folge, PatternTemplate
+
+TOKEN_PATTERN = re.compile(r"\$\$(counter1|counter2|session|record_date|title)\$\$")
+RECORD_DATE_FORMAT = "%d.%m.%Y"  # TODO: make this setting
+
+def episode_values(this: 'Folge') -> dict[str, str]:
+    """All values a token can be replaced with for the given episode"""
+    return {
+        'counter1': str(this.counter1),
+        'counter2': str(this.counter2),
+        'session': this.session,
+        'record_date': this.recording_date.strftime(RECORD_DATE_FORMAT),
+        'title': this.title,
+    }
+
+class CompiledTemplate:
+    """
+    A template pattern split into parts, every odd part is the name of a token, every
+    even part a literal. That is just how re.split with a capture group hands it out.
+    """
+    __slots__ = ('db_uid', 'edit_date', 'parts', 'tags')
+
+    def __init__(self, pattern: str, db_uid: int = 0, edit_date: datetime | None = None, tags: str = ""):
+        self.db_uid = db_uid
+        self.edit_date = edit_date
+        self.tags = tags
+        self.parts: list[str] = TOKEN_PATTERN.split(pattern)
+
+    @staticmethod
+    def from_PatternTemplate(this: 'PatternTemplate') -> 'CompiledTemplate':
+        return CompiledTemplate(this.pattern, this.db_uid, this.edit_date, this.tags)
+
+    def render(self, this: 'Folge') -> str:
+        values = episode_values(this)
+        parts = self.parts.copy()
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return "".join(parts)
+
+_compiled: dict[int, CompiledTemplate] = {}
+_generation = 0
+_lock = threading.Lock()
+
+def compiled_generation() -> int:
+    """Current generation of the cache, read it before loading a template from the database"""
+    with _lock:
+        return _generation
+
+def get_compiled(template_id: int) -> CompiledTemplate | None:
+    """Returns the cached compiled template or None if it was never compiled or got invalidated"""
+    with _lock:
+        return _compiled.get(template_id)
+
+def compile_template(this: 'PatternTemplate', generation: int | None = None) -> CompiledTemplate:
+    """
+    Compiles and caches the template, as long as id and edit_date are the same as the cached
+    version nothing is compiled again
+
+    :param generation: what compiled_generation() returned before the template was read, if the
+        cache got invalidated since the template is still compiled but not cached
+    """
+    with _lock:
+        cached = _compiled.get(this.db_uid)
+        if cached and cached.edit_date == this.edit_date:
+            return cached
+    compiled = CompiledTemplate.from_PatternTemplate(this)
+    with _lock:
+        if generation is None or generation == _generation:
+            _compiled[this.db_uid] = compiled
+    return compiled
+
+def invalidate_compiled(template_id: int | None = None) -> None:
+    """
+    Drops a compiled template from the cache, without an id the entire cache is cleared
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        if template_id is None:
+            _compiled.clear()
+        else:
+            _compiled.pop(template_id, None)
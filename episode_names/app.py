@@ -20,10 +20,14 @@ import sys
 #
 # @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
 
+import argparse
+import logging
 import time
 from typing import Iterable
 
+from peewee import PeeweeException
 from rich.console import RenderableType
+from textual import work
 from textual.app import App, ComposeResult, SystemCommand
 from textual.binding import Binding
 from textual.containers import Vertical
@@ -32,7 +36,11 @@ from textual.screen import ModalScreen, Screen
 
 from episode_names.Modals.DialogueModals import YesNoBox
 from episode_names.Screens import EpisodeScreen, TemplateScreen, SettingsScreen
-from episode_names.Utility import MenuProvider, i18n, user_setup
+from episode_names.Utility import MenuProvider, DescriptionProvider, i18n, user_setup
+from episode_names.Utility.backup import stop_backups, get_backup_manager
+from episode_names.Utility.db import database_proxy, RenderedDescription, is_read_only
+from episode_names.Utility.maintenance import (run_maintenance, MAINTENANCE_TASKS, DEFAULT_MAINTENANCE,
+                                              DESTRUCTIVE_MAINTENANCE)
 from episode_names.__init__ import __version__
 
 __author__ = "Bruno DeVries"
@@ -66,7 +74,7 @@ class DebugLog(ModalScreen[bool]):
 
 class EpisodeNames(App):
     CSS_PATH = 'app_design.tcss'
-    COMMANDS = {MenuProvider}
+    COMMANDS = {MenuProvider, DescriptionProvider}
     COMMAND_PALETTE_BINDING = "circumflex_accent"
 
     BINDINGS = [
@@ -99,6 +107,23 @@ class EpisodeNames(App):
         self.theme = "flexoki"
         self.console.set_window_title(self.console_title)
         self.app.switch_mode("episodes")
+        if not is_read_only():
+            self._render_stale()
+
+    @work(thread=True, exclusive=True, group="render_stale")
+    def _render_stale(self) -> None:
+        """
+        Once per start, renders the stored descriptions that are missing or outdated, for databases
+        from before they existed or changed by an older version
+        """
+        try:
+            count = RenderedDescription.refresh_stale()
+            if count:
+                logging.info(f"{count} descriptions rendered at start")
+        except PeeweeException as e:
+            logging.warning(f"Rendering the stored descriptions failed, search will miss them: {e!r}")
+        finally:
+            database_proxy.close()  # every thread gets its own connection
 
     def get_system_commands(self, screen: Screen) -> Iterable[SystemCommand]:
         yield from super().get_system_commands(screen)
@@ -133,10 +158,34 @@ class EpisodeNames(App):
         self.app.push_screen(YesNoBox(i18n["Do you want to quit?"]), handle_quit_message)
 
 def run_main():
+    parser = argparse.ArgumentParser(prog=__appname__)
+    parser.add_argument("--maintenance", nargs="*", choices=list(MAINTENANCE_TASKS), metavar="TASK",
+                        help=f"run database maintenance instead of the interface, tasks: {', '.join(MAINTENANCE_TASKS)}"
+                             f" (default: {' '.join(DEFAULT_MAINTENANCE)})")
+    args = parser.parse_args()
+    if args.maintenance is not None:
+        tasks = args.maintenance or DEFAULT_MAINTENANCE
+        user_setup(__appname__, __appauthor__, __folder_version__)
+        manager = get_backup_manager()
+        if manager:
+            # * waits for the snapshot at start, none may run on its own while the tasks rewrite the file
+            manager.stop(final_backup=False)
+            if not manager.last_backup and DESTRUCTIVE_MAINTENANCE.intersection(tasks):
+                manager.backup_now()
+        try:
+            results = run_maintenance(tasks)
+        finally:
+            stop_backups()
+        for each in results:
+            print(each)
+        sys.exit(0 if all(each.ok for each in results) else 1)
     print("Running App")
     user_setup(__appname__, __appauthor__, __folder_version__)
     app = EpisodeNames()
-    app.run()
+    try:
+        app.run()
+    finally:
+        stop_backups()  # waits for a running snapshot and takes the last one
 
 if __name__ == "__main__":
     run_main()
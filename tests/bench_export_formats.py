@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2024 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Size and export/import time of every EXPORT_FORMATS entry on a synthetic database, not collected
+by pytest, run it by hand:
+
+    python tests/bench_export_formats.py [episodes]
+"""
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from episode_names.Utility.db import init_db, database_proxy, Episode, Project, TextTemplate
+from episode_names.Utility.db_aux_utility import EXPORT_FORMATS, export_to_json, import_from_json
+
+def fill(episodes: int) -> None:
+    """One project and template with the given number of episodes, written in one transaction"""
+    with database_proxy.atomic():
+        project_id = Project.insert(name="Benchmark", category="bench", description="").execute()
+        template_id = TextTemplate.insert(
+            title="Benchmark", tags="bench, mark",
+            pattern="Episode $$counter1$$ - $$title$$\nRecorded $$record_date$$ in session $$session$$\n"
+                    "Some boilerplate every description repeats, links, socials and so on").execute()
+        today, now = date.today(), datetime.now()
+        rows = [{'title': f"Episode number {i}", 'counter1': i, 'counter2': 0,
+                 'record_date': today - timedelta(days=i % 1000), 'session': f"S{i // 4}",
+                 'description': "", 'notes': None, 'template_id': template_id, 'project_id': project_id,
+                 'edit_date': now, 'create_date': now}
+                for i in range(1, episodes + 1)]
+        for start in range(0, len(rows), 500):
+            Episode.insert_many(rows[start:start + 500]).execute()
+
+def timed(call) -> tuple[float, object]:
+    start = time.perf_counter()
+    res = call()
+    return time.perf_counter() - start, res
+
+def main(episodes: int = 10_000) -> None:
+    folder = Path(tempfile.mkdtemp(prefix="en_bench_"))
+    init_db(folder / "source.db")
+    fill(episodes)
+    database_proxy.close()
+    print(f"{episodes} episodes, files in {folder}")
+    print(f"{'format':<10} {'size KiB':>10} {'export s':>10} {'import s':>10}")
+    for fmt, suffix in EXPORT_FORMATS.items():
+        file_path = folder / f"export{suffix}"
+        init_db(folder / "source.db")
+        export_time, ok = timed(lambda: export_to_json(file_path, compact=True, fmt=fmt))
+        database_proxy.close()
+        if not ok:
+            print(f"{fmt:<10} export failed")
+            continue
+        init_db(folder / f"target_{fmt}.db", "bulk-import")
+        import_time, count = timed(lambda: import_from_json(file_path))
+        database_proxy.close()
+        size = file_path.stat().st_size / 1024
+        print(f"{fmt:<10} {size:>10.0f} {export_time:>10.2f} {import_time:>10.2f}"
+              + ("" if count > 0 else "  import failed"))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
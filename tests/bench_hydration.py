@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2024 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""
+Time and peak allocation of loading a project as Folge objects, once through peewee model
+instances and Folge.from_episode, once straight from cursor rows like Episode.by_project does.
+Not collected by pytest, run it by hand:
+
+    python tests/bench_hydration.py [episodes]
+"""
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from peewee import JOIN
+
+from episode_names.Utility.db import init_db, database_proxy, Episode, Project, TextTemplate, Folge
+from bench_export_formats import fill
+
+def by_project_models(project_id: int) -> list[Folge]:
+    """What loading a project looked like before, one model instance per row that then gets copied"""
+    return [Folge.from_episode(each) for each in (Episode
+                                                 .select(Episode, TextTemplate.id, TextTemplate.title)
+                                                 .join(TextTemplate, JOIN.LEFT_OUTER)
+                                                 .where(Episode.project_id == project_id)
+                                                 .order_by(Episode.counter1.asc()))]
+
+def by_project_rows(project_id: int) -> list[Folge]:
+    return Episode.by_project(project_id)
+
+def measure(load, project_id: int, rounds: int = 3) -> tuple[float, float]:
+    """
+    :return: best time in seconds and peak allocation in MiB, the peak is taken in a separate
+             run as tracemalloc slows everything down considerably
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        load(project_id)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    load(project_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024 / 1024
+
+def main(episodes: int = 100_000) -> None:
+    init_db(Path(tempfile.mkdtemp(prefix="en_bench_")) / "hydration.db")
+    fill(episodes)
+    project_id = Project.get_last_edited()
+    print(f"{episodes} episodes")
+    print(f"{'path':<8} {'time s':>8} {'peak MiB':>10}")
+    for name, load in (("models", by_project_models), ("rows", by_project_rows)):
+        seconds, peak = measure(load, project_id)
+        print(f"{name:<8} {seconds:>8.2f} {peak:>10.1f}")
+    database_proxy.close()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
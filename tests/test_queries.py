@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2024 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""Statements the hot queries and listing paths issue, checked against a temporary database"""
+import logging
+
+import pytest
+
+from episode_names.Utility.db import init_db, database_proxy, Episode, Project, TextTemplate
+from episode_names.Utility.order import create_dummy_data
+
+class QueryRecorder(logging.Handler):
+    """
+    Collects every statement peewee executes while active, peewee itself logs all
+    queries as (sql, params) on debug level so this just listens in on that.
+
+    with QueryRecorder() as rec:
+        Episode.by_project(1)
+    print(len(rec.queries))
+    """
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.queries: list[tuple[str, tuple]] = []
+        self._logger = logging.getLogger("peewee")
+        self._old_level = self._logger.level
+        self._old_propagate = self._logger.propagate
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if isinstance(record.msg, tuple) and len(record.msg) == 2:
+            self.queries.append(record.msg)
+
+    def __enter__(self) -> 'QueryRecorder':
+        self._old_level = self._logger.level
+        self._old_propagate = self._logger.propagate
+        self._logger.setLevel(logging.DEBUG)
+        self._logger.propagate = False  # otherwise every statement ends up in the log file
+        self._logger.addHandler(self)
+        return self
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    def __exit__(self, *args) -> None:
+        self._logger.removeHandler(self)
+        self._logger.setLevel(self._old_level)
+        self._logger.propagate = self._old_propagate
+
+@pytest.fixture
+def db(tmp_path):
+    init_db(tmp_path / "test.db")
+    create_dummy_data()
+    yield
+    database_proxy.close()
+
+def _hot_queries(project_id: int) -> dict:
+    """The queries used on every project switch and tree redraw together with the index they should use"""
+    return {
+        'Episode.by_project': (lambda: Episode.by_project(project_id), "episode_project_id_counter1"),
+        'Episode.get_latest': (lambda: Episode.get_latest(project_id), "episode_project_id_counter1"),
+        'Episode.page_by_project': (lambda: Episode.page_by_project(project_id, (2**31, 0, 0)), "episode_project_id_counter1"),
+        'Project.has_counter2': (lambda: Project.has_counter2(project_id), "episode_project_id_counter2_partial"),
+        'Project.get_tree_as_playlist': (Project.get_tree_as_playlist, "episode_project_id_edit_date"),
+        'Project.get_categories': (lambda: Project.get_categories(ordered="DESC"), "episode_project_id_edit_date"),
+        'Project.get_last_edited': (Project.get_last_edited, "episode_project_id_edit_date"),
+    }
+
+def explain_hot_queries(project_id: int | None = None) -> dict[str, list[str]]:
+    """
+    Runs the hot queries and returns the 'EXPLAIN QUERY PLAN' of every statement they issued
+
+    :param project_id: project to run the per project queries with, defaults to the last edited one
+    :return: dictionary of method name and the plan lines of all its statements
+    """
+    if project_id is None:
+        project_id = Project.get_last_edited() or 0
+    plans = {}
+    for name, (query, _) in _hot_queries(project_id).items():
+        with QueryRecorder() as rec:
+            query()
+        plans[name] = []
+        for sql, params in rec.queries:
+            cursor = database_proxy.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+            plans[name].extend(row[-1] for row in cursor.fetchall())
+    return plans
+
+def hot_queries_use_indexes(project_id: int | None = None) -> bool:
+    """
+    Checks that every hot query is actually planned with the index made for it, if one does not
+    the index is either missing or the query changed in a way sqlite cannot use it anymore.
+
+    :param project_id: see explain_hot_queries
+    :return: True if all queries use their index
+    """
+    if project_id is None:
+        project_id = Project.get_last_edited() or 0
+    expected = {name: index for name, (_, index) in _hot_queries(project_id).items()}
+    all_good = True
+    for name, plan in explain_hot_queries(project_id).items():
+        if not any(expected[name] in line for line in plan):
+            logging.warning(f"{name} does not use {expected[name]}: {plan}")
+            all_good = False
+    return all_good
+
+# * maximum number of statements a listing path may issue, no matter how many rows it returns
+LISTING_QUERY_BUDGET = {
+    'Episode.by_project': 1,
+    'Episode.get_latest': 1,
+    'Episode.as_Folge_by_uid': 1,
+    'Project.dump': 1,
+    'TextTemplate.dump': 1,
+    'Project.get_tree_as_playlist': 1,
+}
+
+def check_query_budget(project_id: int | None = None) -> dict[str, int]:
+    """
+    Runs every listing path and counts the statements it issued, anything above the fixed
+    budget in LISTING_QUERY_BUDGET is a N+1 problem sneaking back in.
+
+    :param project_id: project to run the per project paths with, defaults to the last edited one
+    :return: dictionary of the paths over budget and their actual statement count, empty if all is fine
+    """
+    if project_id is None:
+        project_id = Project.get_last_edited() or 0
+    latest = Episode.get_latest(project_id)
+    listing_paths = {
+        'Episode.by_project': lambda: Episode.by_project(project_id),
+        'Episode.get_latest': lambda: Episode.get_latest(project_id),
+        'Episode.as_Folge_by_uid': lambda: Episode.as_Folge_by_uid(latest.db_uid if latest else 0),
+        'Project.dump': Project.dump,
+        'TextTemplate.dump': TextTemplate.dump,
+        'Project.get_tree_as_playlist': Project.get_tree_as_playlist,
+    }
+    over_budget = {}
+    for name, path in listing_paths.items():
+        with QueryRecorder() as rec:
+            path()
+        if rec.count > LISTING_QUERY_BUDGET[name]:
+            logging.warning(f"{name} issued {rec.count} statements, budget is {LISTING_QUERY_BUDGET[name]}")
+            over_budget[name] = rec.count
+    return over_budget
+
+def test_listing_paths_stay_in_budget(db):
+    assert check_query_budget() == {}
+
+def test_hot_queries_use_indexes(db):
+    assert hot_queries_use_indexes()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright 2024 by BurnoutDV, <development@burnoutdv.com>
+#
+# This file is part of EpisodeNames.
+#
+# EpisodeNames is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, either
+# version 3 of the License, or (at your option) any later version.
+#
+# EpisodeNames is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# @license GPL-3.0-only <https://www.gnu.org/licenses/gpl-3.0.en.html>
+
+"""Export, import, merge and sync round trips between temporary databases"""
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from episode_names.Utility.db import (
+    init_db, database_proxy, Episode, Project, TextTemplate, RenderedDescription, ChangeLog
+)
+from episode_names.Utility.db_aux_utility import export_to_json, export_since, import_from_json, merge_from_json
+from episode_names.Utility.json_stream import JsonStreamReader
+from episode_names.Utility.order import create_dummy_data
+from episode_names.Utility.sync import sync_from
+
+def counts() -> tuple[int, int, int]:
+    return Project.select().count(), TextTemplate.select().count(), Episode.select().count()
+
+@pytest.fixture
+def db(tmp_path):
+    init_db(tmp_path / "local.db")
+    create_dummy_data()
+    yield tmp_path
+    database_proxy.close()
+
+def switch_to(db_path) -> None:
+    """Sync and export work on the one global database, the other side has to be a file"""
+    database_proxy.close()
+    init_db(db_path)
+
+def retitle(title: str, edit_date: datetime) -> int:
+    """Changes the title of the newest episode, returns its id"""
+    uid = Episode.select(Episode.id).order_by(Episode.id.desc()).scalar()
+    Episode.update(title=title, edit_date=edit_date).where(Episode.id == uid).execute()
+    return uid
+
+def test_export_import_round_trip(db):
+    before = counts()
+    assert export_to_json(db / "export.json")
+    switch_to(db / "empty.db")
+    assert import_from_json(db / "export.json") == sum(before)
+    assert counts() == before
+    # * imported episodes come without stored descriptions, the import renders them
+    assert RenderedDescription.select().count() == Episode.select().where(Episode.template_id > 0).count()
+
+def test_failed_import_with_purge_rolls_back(db):
+    before = counts()
+    assert export_to_json(db / "export.json")
+    text = (db / "export.json").read_text(encoding="utf-8")
+    (db / "truncated.json").write_text(text[:len(text) * 2 // 3], encoding="utf-8")
+    assert import_from_json(db / "truncated.json", purge_first=True) == -1
+    assert counts() == before
+
+def test_merge_own_export_changes_nothing(db):
+    before = counts()
+    assert export_to_json(db / "export.json")
+    res = merge_from_json(db / "export.json")
+    assert res['inserted'] == 0 and res['updated'] == 0
+    assert counts() == before
+
+def test_merge_takes_newer_episodes(db):
+    assert export_to_json(db / "export.json")
+    data = json.loads((db / "export.json").read_text(encoding="utf-8"))
+    uid = max(data['Episodes'].values(), key=lambda e: e['uid'])['uid']
+    newest = data['Episodes'][str(uid)]
+    newest['title'] = "Merged title"
+    newest['edit_date'] = (datetime.now() + timedelta(days=1)).isoformat()
+    (db / "export.json").write_text(json.dumps(data), encoding="utf-8")
+    res = merge_from_json(db / "export.json")
+    assert res['updated'] == 1 and res['inserted'] == 0
+    assert Episode.get_by_id(uid).title == "Merged title"
+
+def test_export_prunes_change_log(db):
+    assert export_to_json(db / "export.json")
+    sequence = json.loads((db / "export.json").read_text(encoding="utf-8"))['__sequence']
+    assert sequence > 0 and ChangeLog.select().count() == 0
+    uid = retitle("Changed after the export", datetime.now())
+    assert export_since(sequence, db / "delta.json") == sequence + 1
+    delta = json.loads((db / "delta.json").read_text(encoding="utf-8"))
+    assert [each['uid'] for each in delta['Episodes'].values()] == [uid]
+    assert export_since(0, db / "too_old.json") is None  # * the log before the export is gone
+    assert not (db / "too_old.json").exists()
+
+def test_sync_db_to_db(db):
+    database_proxy.close()
+    (db / "remote.db").write_bytes((db / "local.db").read_bytes())
+    switch_to(db / "remote.db")
+    retitle("Newer on the other side", datetime.now() + timedelta(days=1))
+    switch_to(db / "local.db")
+    before = counts()
+    report = sync_from(db / "remote.db")
+    assert (report.added, report.updated, report.conflicting) == (0, 1, 0)
+    assert counts() == before
+    assert Episode.select().where(Episode.title == "Newer on the other side").count() == 1
+
+def test_sync_counts_conflicts(db):
+    database_proxy.close()
+    (db / "remote.db").write_bytes((db / "local.db").read_bytes())
+    switch_to(db / "remote.db")
+    retitle("Older on the other side", datetime.now() - timedelta(days=1))
+    switch_to(db / "local.db")
+    retitle("Newer on this side", datetime.now())
+    report = sync_from(db / "remote.db")
+    assert (report.updated, report.conflicting) == (0, 1)
+    assert report.conflicts[0][0] == 'Episodes'
+    assert Episode.select().where(Episode.title == "Newer on this side").count() == 1
+
+def test_sync_from_export_into_empty_db(db):
+    before = counts()
+    assert export_to_json(db / "export.jsonl.gz")
+    switch_to(db / "empty.db")
+    report = sync_from(db / "export.jsonl.gz")
+    assert report.added == sum(before) and report.conflicting == 0
+    assert counts() == before
+    again = sync_from(db / "export.jsonl.gz")
+    assert (again.added, again.updated, again.unchanged) == (0, 0, sum(before))
+
+def test_sync_dry_run_changes_nothing(db):
+    assert export_to_json(db / "export.json")
+    switch_to(db / "empty.db")
+    report = sync_from(db / "export.json", dry_run=True)
+    assert report.added > 0
+    assert counts() == (0, 0, 0)
+
+@pytest.mark.parametrize("cut", [1, 10, 25, 40])
+def test_stream_reader_rejects_truncated_input(cut):
+    text = json.dumps({'Projects': {'1': {'uid': 1, 'name': "a"}}, 'Episodes': {'1': {'uid': 1}}, '__version': 1})
+    reader = JsonStreamReader(io.StringIO(text[:cut]), chunk_size=8)
+    with pytest.raises(json.JSONDecodeError):
+        list(reader.sections())
+
+def test_stream_reader_small_chunks():
+    data = {'Projects': {'1': {'uid': 1, 'name': "a" * 50}}, 'Episodes': {}, '__version': 3}
+    reader = JsonStreamReader(io.StringIO(json.dumps(data)), chunk_size=4)
+    assert list(reader.sections()) == [('Projects', '1', data['Projects']['1']), ('__version', None, 3)]